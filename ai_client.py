@@ -0,0 +1,129 @@
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# --- CLIENT GEMINI PIGRO ---
+# Nessuna chiamata di rete finche' la chat non serve davvero: il modello
+# scelto resta in cache per processo con un TTL e un ordine di fallback fisso.
+MODEL_FALLBACK = ("models/gemini-1.5-flash", "models/gemini-1.5-pro", "models/gemini-1.0-pro")
+
+
+class GeminiClient:
+    def __init__(self, api_key, fallback=MODEL_FALLBACK, ttl=3600, retry_after=60):
+        self.api_key = api_key
+        self.fallback = tuple(fallback)
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._genai = None
+        self._model = None
+        self._model_name = None
+        self._resolved_at = 0
+        self._failed_at = 0
+
+    def _client(self):
+        if self._genai is None:
+            import google.generativeai as genai
+            genai.configure(api_key=self.api_key)
+            self._genai = genai
+        return self._genai
+
+    def _select(self, available):
+        for name in self.fallback:
+            if name in available: return name
+        return available[0] if available else None
+
+    def model(self):
+        with self._lock:
+            now = time.time()
+            if self._model is not None and now - self._resolved_at < self.ttl: return self._model
+            if self._model is None and now - self._failed_at < self.retry_after: return None
+            try:
+                genai = self._client()
+                available = [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
+                name = self._select(available)
+                if not name: raise LookupError("no Gemini model supports generateContent")
+                if name != self._model_name:
+                    self._model = genai.GenerativeModel(name)
+                    self._model_name = name
+                self._resolved_at = now
+            except Exception:
+                # Con un modello gia' risolto si continua a usarlo fino al prossimo TTL
+                if self._model is not None: self._resolved_at = now
+                else: self._failed_at = now
+            return self._model
+
+    @property
+    def model_name(self):
+        return self._model_name
+
+
+# --- CACHE RISPOSTE CHAT ---
+# Domande quasi identiche sullo stesso asset, nella stessa lingua e con un
+# contesto di mercato simile (prezzo e RSI a fasce) condividono la risposta.
+# Solo le domande che citano il portafoglio o la conversazione ricevono quel
+# contesto nel prompt: sono personali e non passano mai dalla cache.
+PERSONAL_TERMS = {
+    "portafoglio", "portfolio", "cartera", "portefeuille", "posizione", "posizioni", "position", "positions",
+    "posicion", "posiciones", "holdings", "lotti", "mio", "mia", "miei", "mie", "my", "mine", "mis", "mon",
+    "prima", "precedente", "sopra", "detto", "before", "earlier", "previous", "above", "said",
+    "antes", "anterior", "dijiste", "avant", "precedent", "dit",
+}
+class ResponseCache:
+    def __init__(self, max_entries=512, ttl=900, price_step=0.01, rsi_step=5.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.price_step = price_step
+        self.rsi_step = rsi_step
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    @staticmethod
+    def normalize(question):
+        q = unicodedata.normalize("NFKD", question.lower())
+        q = "".join(c for c in q if not unicodedata.combining(c))
+        return " ".join(re.sub(r"[^\w\s]", " ", q).split())
+
+    def _bucket(self, value, step, log=False):
+        if value is None or value != value or (log and value <= 0): return None
+        if log: return round(math.log(value) / math.log1p(step))
+        return int(value // step)
+
+    @classmethod
+    def personal(cls, question):
+        return not PERSONAL_TERMS.isdisjoint(cls.normalize(question).split())
+
+    def key(self, question, symbol, lang, price, rsi):
+        return (self.normalize(question), symbol.upper(), lang,
+                self._bucket(price, self.price_step, log=True), self._bucket(rsi, self.rsi_step))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl:
+                del self._entries[key]
+                self._counters["expired"] += 1
+                entry = None
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry[1]
+
+    def put(self, key, text):
+        with self._lock:
+            self._entries[key] = (time.time(), text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            total = self._counters["hits"] + self._counters["misses"]
+            return dict(self._counters, size=len(self._entries), hit_rate=self._counters["hits"] / total if total else 0.0)
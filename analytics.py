@@ -0,0 +1,103 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# --- CODA EVENTI ANALYTICS ---
+# put() non fa mai I/O: gli eventi finiscono in un buffer limitato e un
+# worker li scrive in blocco (per dimensione o per tempo). A buffer pieno
+# l'evento viene scartato oppure riversato su disco e ripreso in seguito.
+OVERFLOW_POLICIES = ("drop", "spill")
+
+
+class EventQueue:
+    def __init__(self, sink, batch_size=50, flush_interval=10.0, max_queued=10000, overflow="drop", spill_path=None):
+        if overflow not in OVERFLOW_POLICIES: raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}")
+        if overflow == "spill" and not spill_path: raise ValueError("overflow='spill' requires spill_path")
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queued = max_queued
+        self.overflow = overflow
+        self.spill_path = spill_path
+        self._buf = deque()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._counters = {"queued": 0, "flushed": 0, "dropped": 0, "spilled": 0, "failed_batches": 0}
+        self._thread = threading.Thread(target=self._run, name="analytics-queue", daemon=True)
+        self._thread.start()
+
+    def put(self, event):
+        with self._cond:
+            if len(self._buf) >= self.max_queued:
+                if self.overflow == "spill" and self._spill([event]):
+                    self._counters["spilled"] += 1
+                else:
+                    self._counters["dropped"] += 1
+                return False
+            self._buf.append(event)
+            self._counters["queued"] += 1
+            if len(self._buf) >= self.batch_size: self._cond.notify()
+        return True
+
+    def stats(self):
+        with self._cond:
+            return dict(self._counters, pending=len(self._buf))
+
+    def _spill(self, events):
+        try:
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for e in events: f.write(json.dumps(e) + "\n")
+            return True
+        except OSError:
+            return False
+
+    def _unspill(self):
+        # Riprende dal disco solo quanto entra nel buffer
+        if self.overflow != "spill" or not os.path.exists(self.spill_path): return
+        with self._cond:
+            room = self.max_queued - len(self._buf)
+            if room <= 0: return
+            try:
+                with open(self.spill_path, encoding="utf-8") as f: lines = f.readlines()
+                back, rest = lines[:room], lines[room:]
+                if rest:
+                    with open(self.spill_path, "w", encoding="utf-8") as f: f.writelines(rest)
+                else: os.remove(self.spill_path)
+            except OSError:
+                return
+            for line in back: self._buf.append(json.loads(line))
+
+    def flush(self):
+        with self._flush_lock:
+            self._unspill()
+            while True:
+                with self._cond:
+                    batch = [self._buf.popleft() for _ in range(min(self.batch_size, len(self._buf)))]
+                if not batch: return True
+                try:
+                    self.sink(batch)
+                except Exception:
+                    # Il batch torna in testa alla coda; l'eccedenza segue la policy di overflow
+                    with self._cond:
+                        self._counters["failed_batches"] += 1
+                        room = self.max_queued - len(self._buf)
+                        keep, lost = batch[:max(room, 0)], batch[max(room, 0):]
+                        self._buf.extendleft(reversed(keep))
+                        if lost:
+                            if self.overflow == "spill" and self._spill(lost): self._counters["spilled"] += len(lost)
+                            else: self._counters["dropped"] += len(lost)
+                    return False
+                with self._cond: self._counters["flushed"] += len(batch)
+
+    def _run(self):
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            with self._cond:
+                self._cond.wait(max(deadline - time.monotonic(), 0))
+                ready = len(self._buf) >= self.batch_size or time.monotonic() >= deadline
+            if ready:
+                # Anche dopo un errore si attende un intervallo pieno prima di riprovare
+                self.flush()
+                deadline = time.monotonic() + self.flush_interval
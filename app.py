@@ -1,20 +1,15 @@
 import streamlit as st
-import google.generativeai as genai
 import os
-import yfinance as yf
-import pandas as pd
-import pandas_ta as ta
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import requests
-import xml.etree.ElementTree as ET
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import json
 from datetime import datetime
 import hashlib
 import time
 import re
+# Solo moduli leggeri qui: yfinance, pandas, plotly, gspread e Gemini vengono
+# importati dalle pagine (o dalle risorse) che li usano davvero.
+from ai_client import GeminiClient, ResponseCache
+from analytics import EventQueue
+from database import PORTFOLIO_HEADER, CsvBackend, PortfolioRepository, SheetsBackend, UserDirectory, open_sheets
+from telemetry import Telemetry, pause
 
 # --- 1. CONFIGURAZIONE E FORZATURA BARRA LATERALE ---
 st.set_page_config(
@@ -41,12 +36,17 @@ LANGUAGES = {
         "port_subtitle": "I tuoi Asset",
         "port_add": "AGGIUNGI TITOLO",
         "port_ticker": "Ticker (es. NVDA)", "port_qty": "Quantità", "port_price": "Prezzo ($)", "btn_save": "SALVA",
+        "port_avg": "PMC", "port_lots": "lotti",
         "disclaimer": "⚠️ Market-Core è uno strumento IA. Non costituisce consulenza finanziaria.",
         "chart_settings": "📊 Impostazioni Grafico", "period": "📅 Periodo", "style": "📈 Stile", "indicators": "⚙️ Indicatori",
         "candles": "Candele", "line": "Linea", "price": "Prezzo",
         "no_news": "Nessuna notizia trovata.", "ask_ai": "Chiedimi un'analisi sul titolo...",
         "no_asset": "Nessun asset salvato.", "logout": "LOGOUT SICURO", "error_ai": "L'IA non è al momento disponibile.",
-        "loading_chart": "Compilazione dati grafici in corso..."
+        "loading_chart": "Compilazione dati grafici in corso...",
+        "screener_title": "Screener Watchlist", "screener_watchlist": "Simboli separati da virgola", "btn_screen": "AVVIA SCREENER",
+        "backtest_title": "Backtest Segnali", "bt_strategy": "Strategia", "bt_cost": "Costo per operazione (bps)", "btn_backtest": "AVVIA BACKTEST",
+        "did_you_mean": "Forse cercavi:", "live_mode": "🔴 Live", "quotes_pending": "⏱ Quotazioni in arrivo...",
+        "use_ticker": "Usa come ticker", "pick_symbol": "Scegli un simbolo tra i suggerimenti."
     },
     "EN": {
         "hero_t": "MARKET-CORE", "hero_s": "Real-time AI Quantitative Analysis.",
@@ -60,12 +60,17 @@ LANGUAGES = {
         "port_subtitle": "Your Assets",
         "port_add": "ADD ASSET",
         "port_ticker": "Ticker (e.g. NVDA)", "port_qty": "Quantity", "port_price": "Price ($)", "btn_save": "SAVE",
+        "port_avg": "Avg cost", "port_lots": "lots",
         "disclaimer": "⚠️ Market-Core is an AI tool. Not financial advice.",
         "chart_settings": "📊 Chart Settings", "period": "📅 Period", "style": "📈 Style", "indicators": "⚙️ Indicators",
         "candles": "Candles", "line": "Line", "price": "Price",
         "no_news": "No news found.", "ask_ai": "Ask for an analysis...",
         "no_asset": "No assets saved.", "logout": "SECURE LOGOUT", "error_ai": "AI is currently unavailable.",
-        "loading_chart": "Compiling chart data..."
+        "loading_chart": "Compiling chart data...",
+        "screener_title": "Watchlist Screener", "screener_watchlist": "Comma-separated symbols", "btn_screen": "RUN SCREENER",
+        "backtest_title": "Signal Backtest", "bt_strategy": "Strategy", "bt_cost": "Cost per trade (bps)", "btn_backtest": "RUN BACKTEST",
+        "did_you_mean": "Did you mean:", "live_mode": "🔴 Live", "quotes_pending": "⏱ Waiting for quotes...",
+        "use_ticker": "Use as ticker", "pick_symbol": "Pick a symbol from the suggestions."
     },
     "ES": {
         "hero_t": "MARKET-CORE", "hero_s": "Análisis Cuantitativo IA en tiempo real.",
@@ -79,12 +84,17 @@ LANGUAGES = {
         "port_subtitle": "Tus Activos",
         "port_add": "AÑADIR ACTIVO",
         "port_ticker": "Ticker (ej. NVDA)", "port_qty": "Cantidad", "port_price": "Precio ($)", "btn_save": "GUARDAR",
+        "port_avg": "Coste medio", "port_lots": "lotes",
         "disclaimer": "⚠️ Market-Core es una herramienta de IA. No es asesoramiento financiero.",
         "chart_settings": "📊 Ajustes del Gráfico", "period": "📅 Período", "style": "📈 Estilo", "indicators": "⚙️ Indicadores",
         "candles": "Velas", "line": "Línea", "price": "Precio",
         "no_news": "No se encontraron noticias.", "ask_ai": "Pide un análisis...",
         "no_asset": "Ningún activo guardado.", "logout": "CERRAR SESIÓN", "error_ai": "La IA no está disponible.",
-        "loading_chart": "Recopilando datos del gráfico..."
+        "loading_chart": "Recopilando datos del gráfico...",
+        "screener_title": "Screener de Watchlist", "screener_watchlist": "Símbolos separados por comas", "btn_screen": "EJECUTAR SCREENER",
+        "backtest_title": "Backtest de Señales", "bt_strategy": "Estrategia", "bt_cost": "Coste por operación (bps)", "btn_backtest": "EJECUTAR BACKTEST",
+        "did_you_mean": "Quizás buscabas:", "live_mode": "🔴 En vivo", "quotes_pending": "⏱ Esperando cotizaciones...",
+        "use_ticker": "Usar como ticker", "pick_symbol": "Elige un símbolo de las sugerencias."
     },
     "FR": {
         "hero_t": "MARKET-CORE", "hero_s": "Analyse Quantitative IA en temps réel.",
@@ -98,12 +108,17 @@ LANGUAGES = {
         "port_subtitle": "Vos Actifs",
         "port_add": "AJOUTER ACTIF",
         "port_ticker": "Ticker (ex. NVDA)", "port_qty": "Quantité", "port_price": "Prix ($)", "btn_save": "ENREGISTRER",
+        "port_avg": "PRU", "port_lots": "lots",
         "disclaimer": "⚠️ Market-Core est un outil d'IA. Ce n'est pas un conseil financier.",
         "chart_settings": "📊 Paramètres du Graphique", "period": "📅 Période", "style": "📈 Style", "indicators": "⚙️ Indicateurs",
         "candles": "Bougies", "line": "Ligne", "price": "Prix",
         "no_news": "Aucune actualité trouvée.", "ask_ai": "Demander une analyse...",
         "no_asset": "Aucun actif enregistré.", "logout": "DÉCONNEXION", "error_ai": "L'IA est indisponible.",
-        "loading_chart": "Compilation des données..."
+        "loading_chart": "Compilation des données...",
+        "screener_title": "Screener Watchlist", "screener_watchlist": "Symboles séparés par des virgules", "btn_screen": "LANCER LE SCREENER",
+        "backtest_title": "Backtest des Signaux", "bt_strategy": "Stratégie", "bt_cost": "Coût par opération (bps)", "btn_backtest": "LANCER LE BACKTEST",
+        "did_you_mean": "Vouliez-vous dire :", "live_mode": "🔴 En direct", "quotes_pending": "⏱ En attente des cotations...",
+        "use_ticker": "Utiliser comme ticker", "pick_symbol": "Choisissez un symbole parmi les suggestions."
     }
 }
 
@@ -140,83 +155,132 @@ if 'portfolio' not in st.session_state: st.session_state.portfolio = []
 if 'terminal_booted' not in st.session_state: st.session_state.terminal_booted = False
 L = LANGUAGES[st.session_state.lang]
 
-def resolve_ticker(q):
-    q = q.lower().strip()
-    m = {"bitcoin": "BTC-USD", "ethereum": "ETH-USD", "solana": "SOL-USD", "amazon": "AMZN", "apple": "AAPL", "tesla": "TSLA", "nvidia": "NVDA", "oro": "GC=F", "gold": "GC=F"}
-    if q in m: return m[q]
-    if len(q) >= 5: 
-        if q.upper() in ["BTC", "ETH", "SOL"]: return f"{q.upper()}-USD"
-        return q.upper()
-    return q.upper()
-
-@st.cache_data(ttl=600)
-def fetch_news_rss(q):
-    news = []
-    try:
-        url = f"https://news.google.com/rss/search?q={q}+stock+market&hl=it&gl=IT"
-        r = requests.get(url, timeout=5)
-        root = ET.fromstring(r.content)
-        for i in root.findall('.//item')[:5]: news.append({'t': i.find('title').text, 'l': i.find('link').text})
-    except: pass
-    return news
+@st.cache_resource
+def get_symbol_index():
+    from symbols import SymbolIndex
+    return SymbolIndex.load()
+
+def resolve_ticker(q, substitute=True):
+    return get_symbol_index().resolve(q, substitute=substitute)
+
+def pick_symbol(symbol):
+    st.session_state.search_in = symbol
+
+@st.cache_resource
+def get_news_engine():
+    from news import NewsEngine
+    return NewsEngine()
+
+@st.cache_resource
+def get_bar_store():
+    from market_data import BarStore
+    return BarStore()
+
+@st.cache_resource
+def get_indicator_cache():
+    from indicators import IndicatorCache
+    return IndicatorCache()
+
+BACKTEST_STRATEGIES = {"rsi": "RSI 30/70", "sma_cross": "SMA 20/50", "bollinger": "Bollinger", "macd": "MACD"}
+
+SCREENER_DEFAULT = ["BTC-USD", "ETH-USD", "SOL-USD", "NVDA", "TSLA", "AAPL", "AMZN", "MSFT", "GOOGL", "META", "GC=F", "^IXIC"]
+
+@st.cache_data(ttl=900, show_spinner=False)
+def run_screener(symbols, period="1y"):
+    from screener import load_closes, screen
+    return screen(load_closes(list(symbols), period))
+
+@st.cache_resource
+def get_figure_cache():
+    from charting import FigureCache
+    return FigureCache()
+
+TREND = {"BTC-USD": "BTC", "NVDA": "NVDA", "GC=F": "ORO", "TSLA": "TSLA", "^IXIC": "NASDAQ"}
 
-# --- 5. DATABASE ---
 @st.cache_resource
+def get_quote_service():
+    from market_data import QuoteService
+    return QuoteService(list(TREND.keys()))
+
+LIVE_REFRESH = int(os.environ.get("MARKET_CORE_LIVE_REFRESH", "15"))
+
+# --- 5. DATABASE ---
 def init_db():
-    try:
-        creds_json = os.environ.get("GOOGLE_CREDENTIALS")
-        if not creds_json: return None, None, None
-        creds_dict = json.loads(creds_json)
-        scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-        client = gspread.authorize(creds)
-        sheet = client.open_by_key("1DJesdyf6AeyotOzBqzq-SJGKGe93v_kK6RXNB0LC_ck")
-        return sheet.worksheet("Utenti"), sheet.worksheet("Portafoglio"), sheet.worksheet("Visite")
-    except: return None, None, None
-
-ws_utenti, ws_portafoglio, ws_visite = init_db()
+    # Connessione unica per processo; gspread viene importato solo qui
+    return open_sheets(os.environ.get("GOOGLE_CREDENTIALS"))
+
+@st.cache_resource
+def get_portfolio_repo():
+    # Google Sheets in produzione, CSV locale (stesso formato di portafoglio_email_db.csv) offline e nei test.
+    # Un errore al primo caricamento si propaga: cache_resource non lo memorizza e il rerun successivo riprova
+    ws_portafoglio = init_db()[1]
+    if ws_portafoglio: return PortfolioRepository(SheetsBackend(ws_portafoglio))
+    csv_path = os.environ.get("PORTFOLIO_CSV")
+    if csv_path: return PortfolioRepository(CsvBackend(csv_path, header=PORTFOLIO_HEADER))
+    return None
+
+def try_portfolio_repo():
+    try: return get_portfolio_repo()
+    except Exception: return None
+
+@st.cache_resource
+def get_user_directory():
+    ws_utenti = init_db()[0]
+    if ws_utenti: return UserDirectory(SheetsBackend(ws_utenti))
+    csv_path = os.environ.get("USERS_CSV")
+    if csv_path: return UserDirectory(CsvBackend(csv_path))
+    return None
+
+def append_visits(batch):
+    ws_visite = init_db()[2]
+    if not ws_visite: raise RuntimeError("Visite worksheet unavailable")
+    ws_visite.append_rows(batch)
+
+@st.cache_resource
+def get_visit_queue():
+    # Le visite vengono scritte in blocco da un worker, che apre anche la connessione a Sheets:
+    # la landing non attende ne' la rete ne' l'import di gspread
+    if not os.environ.get("GOOGLE_CREDENTIALS"): return None
+    spill_path = os.environ.get("ANALYTICS_SPILL_PATH")
+    return EventQueue(append_visits, overflow="spill" if spill_path else "drop", spill_path=spill_path)
 
 def load_portfolio(email):
-    if ws_portafoglio:
-        all_data = ws_portafoglio.get_all_values()
-        return [r for r in all_data if len(r) >= 4 and r[0] == email]
+    portfolio_repo = try_portfolio_repo()
+    if portfolio_repo: return portfolio_repo.rows(email)
     return []
 
 def delete_portfolio_item(email, ticker):
-    if ws_portafoglio:
-        records = ws_portafoglio.get_all_values()
-        for i, row in enumerate(records):
-            if len(row) >= 2 and row[0] == email and row[1] == ticker:
-                ws_portafoglio.delete_rows(i + 1)
-                return True
+    portfolio_repo = try_portfolio_repo()
+    if portfolio_repo: return portfolio_repo.delete(email, ticker)
     return False
 
 # --- 6. IA SINC ---
 API_KEY = os.environ.get("GEMINI_API_KEY")
-model = None
-if API_KEY:
-    genai.configure(api_key=API_KEY)
-    try:
-        available_models = [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
-        target_model = None
-        for m_name in ['models/gemini-1.5-flash', 'models/gemini-1.5-pro', 'models/gemini-1.0-pro']:
-            if m_name in available_models:
-                target_model = m_name
-                break
-        if not target_model and available_models: target_model = available_models[0]
-        if target_model: model = genai.GenerativeModel(target_model)
-    except: pass
-
-# --- 7. APPLICAZIONE ---
+
+@st.cache_resource
+def get_ai_client():
+    # Il modello viene risolto solo alla prima domanda in chat, non a ogni rerun
+    return GeminiClient(API_KEY) if API_KEY else None
+
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache()
+
+# --- 7. TELEMETRIA ---
+ADMIN_EMAILS = {e.strip() for e in os.environ.get("ADMIN_EMAILS", "").split(",") if e.strip()}
+
+@st.cache_resource
+def get_telemetry():
+    return Telemetry()
+
+# --- 8. APPLICAZIONE ---
 if st.session_state.page == "landing":
     
     # TRACCIAMENTO INVISIBILE
     if 'tracked' not in st.session_state:
         st.session_state.tracked = True
-        if ws_visite:
-            try:
-                ws_visite.append_row([datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "Visita Landing Page"])
-            except: pass
+        visit_queue = get_visit_queue()
+        if visit_queue: visit_queue.put([datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "Visita Landing Page"])
 
     c1, c2, c3 = st.columns([4, 1, 4])
     with c2: st.session_state.lang = st.selectbox("🌐", ["IT", "EN", "ES", "FR"], index=["IT", "EN", "ES", "FR"].index(st.session_state.lang))
@@ -244,15 +308,13 @@ elif st.session_state.page == "auth":
         pass_in = st.text_input("Password", type="password", key="login_pass")
         if st.button("ENTRA NEL TERMINALE"):
             if email_in and pass_in:
-                if ws_utenti:
-                    users = ws_utenti.get_all_values()
-                    hashed_input = hash_password(pass_in)
-                    user_found = False
-                    for row in users:
-                        if len(row) >= 2 and row[0] == email_in and row[1] == hashed_input:
-                            user_found = True
-                            break
-                    if user_found:
+                user_directory = get_user_directory()
+                if user_directory:
+                    # Foglio non leggibile: errore del database, non credenziali sbagliate
+                    try: user_found = user_directory.authenticate(email_in, hash_password(pass_in))
+                    except Exception: user_found = None
+                    if user_found is None: st.error("Errore Database.")
+                    elif user_found:
                         st.session_state.logged_in = True
                         st.session_state.user_email = email_in
                         st.session_state.portfolio = load_portfolio(email_in)
@@ -268,10 +330,12 @@ elif st.session_state.page == "auth":
         reg_pass = st.text_input("Nuova Password", type="password", key="reg_pass")
         if st.button("CREA ACCOUNT CLOUD"):
             if reg_email and reg_pass:
-                if ws_utenti:
+                user_directory = get_user_directory()
+                if user_directory:
                     try:
-                        ws_utenti.append_row([reg_email, hash_password(reg_pass)])
-                        st.success("Account creato! Ora puoi accedere.")
+                        if user_directory.register(reg_email, hash_password(reg_pass)):
+                            st.success("Account creato! Ora puoi accedere.")
+                        else: st.warning("Email già registrata.")
                     except: st.error("Errore di salvataggio Database.")
                 else: st.error("Errore Server.")
             else: st.warning("Compila tutti i campi.")
@@ -281,6 +345,13 @@ elif st.session_state.page == "auth":
         st.rerun()
 
 elif st.session_state.page == "terminal" and st.session_state.logged_in:
+    from backtest import sweep
+    from charting import FigureCache, build_figure, patch_last
+    from market_data import slice_period
+    from screener import parse_watchlist
+    from valuation import positions, totals
+    telemetry = get_telemetry()
+    t_rerun = time.perf_counter()
     
     if not st.session_state.terminal_booted:
         boot_placeholder = st.empty()
@@ -289,9 +360,9 @@ elif st.session_state.page == "terminal" and st.session_state.logged_in:
             st.markdown("<div style='margin-top:20vh; font-family: Courier New;'>", unsafe_allow_html=True)
             for phrase in boot_phrases:
                 st.markdown(f"<h4 style='color:#00ff41;'>{phrase}</h4>", unsafe_allow_html=True)
-                time.sleep(0.5)
+                pause(0.5)
             st.markdown("</div>", unsafe_allow_html=True)
-            time.sleep(0.5)
+            pause(0.5)
         boot_placeholder.empty()
         st.session_state.terminal_booted = True
         st.rerun()
@@ -302,14 +373,37 @@ elif st.session_state.page == "terminal" and st.session_state.logged_in:
         
         st.divider()
         st.markdown(f"### {L['port_title']}")
+        portfolio_repo = try_portfolio_repo()
+        if portfolio_repo and portfolio_repo.last_error is not None:
+            # Scritture sul foglio fallite: il portafoglio si riallinea (le righe scartate spariscono) e l'errore e' visibile
+            st.session_state.portfolio = portfolio_repo.rows(st.session_state.user_email)
+            pending = portfolio_repo.pending()
+            st.error(f"Errore DB. ({pending} modifiche non salvate)" if pending else "Errore DB.")
         if st.session_state.portfolio:
             st.markdown(f"<span style='color:#888;'>{L['port_subtitle']}</span>", unsafe_allow_html=True)
-            for item in st.session_state.portfolio:
-                ticker, price, qty = item[1], float(item[2]), float(item[3])
+            # Lotti aggregati per ticker e valutati con lo snapshot condiviso (una richiesta per ciclo per tutti gli utenti)
+            quote_service = get_quote_service()
+            quote_service.watch([item[1] for item in st.session_state.portfolio])
+            with telemetry.span("valuation"):
+                snap = quote_service.snapshot()
+                pos = positions(st.session_state.portfolio, snap.prices)
+                tot = totals(pos)
+            if tot['unpriced'] < len(pos):
+                pnl_color = "#00ff41" if tot['pnl'] >= 0 else "#ff0033"
+                st.markdown(f"<div class='asset-box'><b>${tot['value']:,.2f}</b><br><span style='color:{pnl_color};'>{tot['pnl']:+,.2f}$ ({tot['pnl_pct']:+.2f}%)</span></div>", unsafe_allow_html=True)
+            else: st.markdown("<div class='asset-box'><b>N/A</b></div>", unsafe_allow_html=True)
+            if snap.updated_at is None: st.caption(L['quotes_pending'])
+            for i, p in pos.iterrows():
+                ticker = p['ticker']
+                lotti = f" ({p['lots']} {L['port_lots']})" if p['lots'] > 1 else ""
+                if p['price'] == p['price']:
+                    c = "#00ff41" if p['pnl'] >= 0 else "#ff0033"
+                    mercato = f"<br>${p['price']:.2f} | ${p['value']:,.2f} ({p['weight']:.1f}%)<br><span style='color:{c};'>{p['pnl']:+,.2f}$ ({p['pnl_pct']:+.2f}%)</span>"
+                else: mercato = "<br>N/A"
                 col_txt, col_btn = st.columns([4, 1])
-                with col_txt: st.markdown(f"<div class='asset-box'><b>{ticker}</b><br>{qty} qt | ${price:.2f}</div>", unsafe_allow_html=True)
+                with col_txt: st.markdown(f"<div class='asset-box'><b>{ticker}</b>{lotti}<br>{p['qty']:g} qt | {L['port_avg']} ${p['avg_cost']:.2f}{mercato}</div>", unsafe_allow_html=True)
                 with col_btn:
-                    if st.button("🗑️", key=f"del_{ticker}"):
+                    if st.button("🗑️", key=f"del_{i}_{ticker}"):
                         if delete_portfolio_item(st.session_state.user_email, ticker):
                             st.session_state.portfolio = load_portfolio(st.session_state.user_email)
                             st.rerun()
@@ -318,24 +412,33 @@ elif st.session_state.page == "terminal" and st.session_state.logged_in:
         
         st.write("##")
         st.markdown(f"**{L['port_add']}**")
-        p_ticker = st.text_input(L['port_ticker'], key="tck_in").upper()
+        # Nel portafoglio nessuna sostituzione approssimata: si salva solo cio' che l'utente ha scritto o un nome esatto
+        p_ticker = resolve_ticker(st.text_input(L['port_ticker'], key="tck_in"), substitute=False)
         c_qty, c_prc = st.columns(2)
         with c_qty: p_qty = st.number_input(L['port_qty'], min_value=0.01, step=0.01)
         with c_prc: p_price = st.number_input(L['port_price'], min_value=0.01, step=0.01)
         
         if st.button(L['btn_save']):
-            if p_ticker and ws_portafoglio:
+            portfolio_repo = try_portfolio_repo()
+            if p_ticker and portfolio_repo:
                 totale = p_qty * p_price
                 new_row = [st.session_state.user_email, p_ticker, str(p_price), str(p_qty), str(totale), datetime.now().strftime("%Y-%m-%d")]
                 try:
-                    ws_portafoglio.append_row(new_row)
+                    portfolio_repo.add(new_row)
                     st.session_state.portfolio = load_portfolio(st.session_state.user_email)
                     st.rerun() 
                 except: st.error("Errore DB.")
             elif not p_ticker:
                 st.warning("Inserisci Ticker.")
+            else: st.error("Errore DB.")
 
         st.divider()
+        if st.session_state.user_email in ADMIN_EMAILS:
+            with st.expander("⏱ Profiling"):
+                st.dataframe(telemetry.summary(), hide_index=True, use_container_width=True)
+                visit_queue = get_visit_queue()
+                if visit_queue: st.json(visit_queue.stats())
+                st.json(get_response_cache().stats())
         if st.button(L['logout']):
             st.session_state.logged_in = False
             st.session_state.user_email = ""
@@ -345,79 +448,119 @@ elif st.session_state.page == "terminal" and st.session_state.logged_in:
             st.rerun()
 
     st.markdown(f"<h3 style='text-align:center;'>🔍 {L['main_search']}</h3>", unsafe_allow_html=True)
-    u_in = st.text_input("", "Bitcoin", label_visibility="collapsed")
+    if 'search_in' not in st.session_state: st.session_state.search_in = "Bitcoin"
+    u_in = st.text_input("", key="search_in", label_visibility="collapsed")
     t_sym = resolve_ticker(u_in)
-
-    trend = {"BTC-USD": "BTC", "NVDA": "NVDA", "GC=F": "ORO", "TSLA": "TSLA", "^IXIC": "NASDAQ"}
-    m_p = yf.download(list(trend.keys()), period="5d", group_by='ticker', progress=False)
+    # Nessuna corrispondenza esatta: suggerimenti dall'indice locale invece di tentare un ticker inesistente
+    hits = get_symbol_index().search(u_in, limit=5)
+    suggestions = [(s.symbol, s.name) for s in hits] if hits and hits[0].match != "exact" else []
+    raw_ticker = get_symbol_index().ticker_candidate(u_in) if t_sym is None else None
+    if raw_ticker: suggestions.append((raw_ticker, L['use_ticker']))
+    if suggestions:
+        s_cols = st.columns(len(suggestions) + 1)
+        s_cols[0].caption(L['did_you_mean'])
+        for col, (symbol, name) in zip(s_cols[1:], suggestions):
+            col.button(symbol, key=f"sugg_{symbol}", help=name, type="primary" if symbol == t_sym else "secondary", on_click=pick_symbol, args=(symbol,))
+    if t_sym is None and u_in.strip(): st.info(L['pick_symbol'])
+
+    # Nessuna attesa sul primo ciclo del servizio: N/A finche' non arriva il primo snapshot
+    with telemetry.span("strip"): strip = get_quote_service().snapshot()
     t_cols = st.columns(5)
-    for i, (s, n) in enumerate(trend.items()):
-        try:
-            val = m_p[s]['Close'].dropna().iloc[-1]
-            t_cols[i].metric(n, f"${val:.2f}")
-        except: t_cols[i].metric(n, "N/A")
+    for i, (s, n) in enumerate(TREND.items()):
+        val = strip.prices.get(s)
+        if val is not None: t_cols[i].metric(n, f"${val:.2f}")
+        else: t_cols[i].metric(n, "N/A")
+    if strip.updated_at is not None:
+        st.caption(f"⏱ {datetime.fromtimestamp(strip.updated_at).strftime('%H:%M:%S')} ({int(strip.age())}s)")
+    else: st.caption(L['quotes_pending'])
 
     st.divider()
 
+    with st.expander(f"🛰️ {L['screener_title']}"):
+        watchlist = st.text_area(L['screener_watchlist'], ", ".join(SCREENER_DEFAULT), key="screener_in")
+        if st.button(L['btn_screen']): st.session_state.screener_syms = tuple(parse_watchlist(watchlist))
+        if st.session_state.get('screener_syms'):
+            with telemetry.span("screener"): ranked = run_screener(st.session_state.screener_syms)
+            st.dataframe(ranked, hide_index=True, use_container_width=True, column_config={
+                "close": st.column_config.NumberColumn(format="%.2f"), "chg_1d": st.column_config.NumberColumn("1d %", format="%+.2f"),
+                "RSI": st.column_config.NumberColumn(format="%.1f"), "SMA20": st.column_config.NumberColumn(format="%.2f"),
+                "SMA50": st.column_config.NumberColumn(format="%.2f"), "score": st.column_config.NumberColumn(format="%.1f"),
+            })
+
     st.markdown(f"### {L['chart_settings']}")
-    g_col1, g_col2, g_col3 = st.columns(3)
+    g_col1, g_col2, g_col3, g_col4 = st.columns([3, 3, 3, 1], vertical_alignment="bottom")
     with g_col1: periodo = st.selectbox(L['period'], ["3mo", "6mo", "1y", "2y", "5y"], index=1)
     with g_col2: stile_grafico = st.selectbox(L['style'], [L['candles'], L['line']])
     with g_col3: indicatori = st.multiselect(L['indicators'], ["SMA 20", "SMA 50", "Bande di Bollinger", "MACD"], default=["SMA 20"])
+    with g_col4: live = st.toggle(L['live_mode'], key="live_mode")
+
+    # --- GRAFICO LIVE ---
+    # In modalita' live si riesegue solo questo frammento: l'ultima barra arriva
+    # dallo snapshot condiviso delle quotazioni (nessuna richiesta per sessione),
+    # la candela in formazione e le code degli indicatori si aggiornano in modo
+    # incrementale e la figura precedente viene corretta invece che ricostruita.
+    @st.fragment(run_every=LIVE_REFRESH if live else None)
+    def live_chart(df, t_sym, periodo, stile_grafico, indicatori, live):
+        t_fig = time.perf_counter()
+        snap = None
+        if live:
+            quote_service = get_quote_service()
+            quote_service.watch([t_sym])
+            snap = quote_service.snapshot()
+            serie = get_bar_store().series(t_sym, interval="1d")
+            patched = get_bar_store().patch(t_sym, snap.bars.get(t_sym.upper()))
+            if patched is not None: serie = patched
+            df = slice_period(serie, periodo).join(get_indicator_cache().frame((t_sym, "1d"), serie))
+        # Figura gia' costruita per lo stesso simbolo/periodo/stile/indicatori e la stessa ultima barra
+        fig_key = FigureCache.key(t_sym, periodo, stile_grafico, indicatori, L['price'], df)
+        fig = get_figure_cache().get(fig_key, lambda: build_figure(df, stile_grafico == L['candles'], indicatori, L['price']),
+                                     patch=lambda base: patch_last(base, df))
+        telemetry.record("live_tick" if live else "figure", time.perf_counter() - t_fig)
+        with telemetry.span("chart_render"): st.plotly_chart(fig, use_container_width=True)
+        if snap is not None and snap.updated_at:
+            st.caption(f"🔴 LIVE · {df.index[-1].strftime('%Y-%m-%d')} · {float(df['Close'].iloc[-1]):.2f} · ⏱ {datetime.fromtimestamp(snap.updated_at).strftime('%H:%M:%S')} ({int(snap.age())}s)")
 
     st.write("---")
 
     with st.spinner(L['loading_chart']):
-        data = yf.download(t_sym, period=periodo, interval="1d", auto_adjust=True, progress=False)
+        # Ricerca ambigua: nessuna richiesta upstream finche' l'utente non sceglie un suggerimento
+        data = None
+        if t_sym:
+            with telemetry.span("chart_data"): serie = get_bar_store().series(t_sym, interval="1d")
+            data = slice_period(serie, periodo)
         
-        if not data.empty:
-            df = data.copy()
-            if isinstance(df.columns, pd.MultiIndex): df.columns = df.columns.get_level_values(0)
-            
-            df['RSI'] = ta.rsi(df['Close'], length=14)
-            if "SMA 20" in indicatori: df['SMA20'] = ta.sma(df['Close'], length=20)
-            if "SMA 50" in indicatori: df['SMA50'] = ta.sma(df['Close'], length=50)
-            if "Bande di Bollinger" in indicatori:
-                bb = ta.bbands(df['Close'], length=20)
-                if bb is not None:
-                    df['BBL'] = bb.iloc[:, 0]
-                    df['BBU'] = bb.iloc[:, 2]
-            if "MACD" in indicatori:
-                macd = ta.macd(df['Close'])
-                if macd is not None:
-                    df['MACD'] = macd.iloc[:, 0]
-                    df['MACD_sig'] = macd.iloc[:, 2]
-
-            fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.7, 0.3], vertical_spacing=0.05)
-            
-            if stile_grafico == L['candles']:
-                fig.add_trace(go.Candlestick(x=df.index, open=df['Open'], high=df['High'], low=df['Low'], close=df['Close'], name=L['price']), row=1, col=1)
-            else:
-                fig.add_trace(go.Scatter(x=df.index, y=df['Close'], name=L['price'], line=dict(color='#00ff41', width=2)), row=1, col=1)
-            
-            if "SMA 20" in indicatori: fig.add_trace(go.Scatter(x=df.index, y=df['SMA20'], name="SMA 20", line=dict(color='orange', width=1.5)), row=1, col=1)
-            if "SMA 50" in indicatori: fig.add_trace(go.Scatter(x=df.index, y=df['SMA50'], name="SMA 50", line=dict(color='yellow', width=1.5)), row=1, col=1)
-            if "Bande di Bollinger" in indicatori and 'BBU' in df.columns:
-                fig.add_trace(go.Scatter(x=df.index, y=df['BBU'], name="BB Sup", line=dict(color='rgba(255,0,255,0.6)', dash='dot')), row=1, col=1)
-                fig.add_trace(go.Scatter(x=df.index, y=df['BBL'], name="BB Inf", line=dict(color='rgba(255,0,255,0.6)', dash='dot')), row=1, col=1)
-
-            if "MACD" in indicatori and 'MACD' in df.columns:
-                fig.add_trace(go.Scatter(x=df.index, y=df['MACD'], name="MACD", line=dict(color='#00ff41')), row=2, col=1)
-                fig.add_trace(go.Scatter(x=df.index, y=df['MACD_sig'], name="Signal", line=dict(color='orange')), row=2, col=1)
-            else:
-                fig.add_trace(go.Scatter(x=df.index, y=df['RSI'], name="RSI", line=dict(color='magenta', width=1.5)), row=2, col=1)
-                fig.add_hline(y=70, line_dash="dot", line_color="red", row=2, col=1)
-                fig.add_hline(y=30, line_dash="dot", line_color="cyan", row=2, col=1)
-
-            fig.update_layout(template="plotly_dark", height=550, xaxis_rangeslider_visible=False, margin=dict(l=0,r=0,t=10,b=0), legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
-            st.plotly_chart(fig, use_container_width=True)
+        if data is not None and not data.empty:
+            # Indicatori calcolati sull'intera serie (aggiornamento incrementale) e poi tagliati sul periodo
+            with telemetry.span("indicators"): ind = get_indicator_cache().frame((t_sym, "1d"), serie)
+            df = data.join(ind)
+
+            live_chart(df, t_sym, periodo, stile_grafico, indicatori, live)
+
+            with st.expander(f"🧪 {L['backtest_title']}"):
+                b_col1, b_col2 = st.columns(2)
+                with b_col1: bt_strategy = st.selectbox(L['bt_strategy'], list(BACKTEST_STRATEGIES), format_func=BACKTEST_STRATEGIES.get)
+                with b_col2: bt_cost = st.number_input(L['bt_cost'], min_value=0.0, max_value=100.0, value=5.0, step=1.0)
+                if st.button(L['btn_backtest']): st.session_state.bt_req = (t_sym, periodo, bt_strategy, bt_cost)
+                if st.session_state.get('bt_req') == (t_sym, periodo, bt_strategy, bt_cost):
+                    # Sweep dell'intera griglia di parametri sulle stesse barre del grafico
+                    with telemetry.span("backtest"): results = sweep(data['Close'], bt_strategy, cost=bt_cost / 10000)
+                    st.dataframe(results, hide_index=True, use_container_width=True, column_config={
+                        "total_return": st.column_config.NumberColumn("Tot %", format="%+.1f"), "ann_return": st.column_config.NumberColumn("CAGR %", format="%+.1f"),
+                        "ann_vol": st.column_config.NumberColumn("Vol %", format="%.1f"), "sharpe": st.column_config.NumberColumn("Sharpe", format="%.2f"),
+                        "max_drawdown": st.column_config.NumberColumn("Max DD %", format="%.1f"), "exposure": st.column_config.NumberColumn("Exp %", format="%.0f"),
+                        "hit_rate": st.column_config.NumberColumn("Hit %", format="%.0f"),
+                    })
 
             c1, c2 = st.columns([0.4, 0.6])
             with c1:
                 st.subheader(f"📰 {L['news_title']}")
-                news_feed = fetch_news_rss(u_in)
+                # Asset cercato + ogni ticker del portafoglio, scaricati in parallelo
+                news_queries = [u_in] + [item[1] for item in st.session_state.portfolio]
+                with telemetry.span("news"): news_feed = get_news_engine().merged(news_queries)
                 if news_feed:
-                    for n in news_feed: st.markdown(f"• [{n['t']}]({n['l']})")
+                    for n in news_feed:
+                        tag = f"**{n['q']}** · " if n['q'] != u_in else ""
+                        st.markdown(f"• {tag}[{n['t']}]({n['l']})")
                 else: st.write(L['no_news'])
 
             with c2:
@@ -434,34 +577,50 @@ elif st.session_state.page == "terminal" and st.session_state.logged_in:
                         with st.chat_message("user", avatar="🧑‍💻"): st.markdown(inp)
                         
                         with st.chat_message("assistant", avatar="⚡"):
-                            if model:
+                            ai_client = get_ai_client()
+                            response_cache = get_response_cache()
+                            # Portafoglio e storico chat solo se la domanda li cita: in quel caso la risposta
+                            # e' personale e non entra in cache, altrimenti e' condivisibile tra tutti gli utenti
+                            port_context, history = "", ""
+                            personal = response_cache.personal(inp)
+                            if personal and st.session_state.portfolio:
+                                asset_list = ", ".join([f"{item[3]} quote di {item[1]} a {item[2]}$" for item in st.session_state.portfolio])
+                                port_context = f"Portafoglio attuale dell'utente: {asset_list}."
+                            if personal and len(st.session_state.msgs) > 1:
+                                history = "Contesto:\n" + "\n".join([f"{m['role']}: {m['content']}" for m in st.session_state.msgs[-5:-1]])
+                            last_close, last_rsi = float(df['Close'].iloc[-1]), float(df['RSI'].iloc[-1])
+                            cache_key = None if personal else response_cache.key(inp, t_sym, st.session_state.lang, last_close, last_rsi)
+                            cached = response_cache.get(cache_key) if ai_client and cache_key else None
+                            model = None if cached or not ai_client else ai_client.model()
+                            if cached:
+                                # Risposta gia' generata per una domanda equivalente: replay immediato
+                                testo_colorato = colora_segnali(cached)
+                                st.markdown(testo_colorato, unsafe_allow_html=True)
+                                st.session_state.msgs.append({"role": "assistant", "content": testo_colorato})
+                            elif model:
                                 terminal_placeholder = st.empty()
                                 fake_logs = ["⏳...", "📡...", "⚡..."]
                                 for log in fake_logs:
                                     terminal_placeholder.markdown(log)
-                                    time.sleep(0.3)
+                                    pause(0.3)
                                     
                                 try:
-                                    port_context = ""
-                                    if st.session_state.portfolio:
-                                        asset_list = ", ".join([f"{item[3]} quote di {item[1]} a {item[2]}$" for item in st.session_state.portfolio])
-                                        port_context = f"Portafoglio attuale dell'utente: {asset_list}."
-
-                                    ctx = f"Dati attuali - Asset: {t_sym}, Prezzo: {df['Close'].iloc[-1]:.2f}, RSI: {df['RSI'].iloc[-1]:.1f}. {port_context}"
-                                    history = ""
-                                    if len(st.session_state.msgs) > 1:
-                                        history = "Contesto:\n" + "\n".join([f"{m['role']}: {m['content']}" for m in st.session_state.msgs[-5:-1]])
+                                    ctx = f"Dati attuali - Asset: {t_sym}, Prezzo: {last_close:.2f}, RSI: {last_rsi:.1f}. {port_context}"
                                     
                                     prompt = f"Sei un analista finanziario IA. {ctx}\n{history}\nL'utente chiede: {inp}\nRispondi in modo schematico in lingua {st.session_state.lang}. Se l'outlook è positivo usa le parole 'BULLISH' o 'BUY'. Se è negativo usa 'BEARISH' o 'CROLLO'."
                                     
+                                    t_ai = time.perf_counter()
                                     res_stream = model.generate_content(prompt, stream=True)
                                     full_response = ""
                                     
-                                    for chunk in res_stream:
+                                    for n_chunk, chunk in enumerate(res_stream):
+                                        if n_chunk == 0: telemetry.record("ai_first_chunk", time.perf_counter() - t_ai)
                                         full_response += chunk.text
                                         terminal_placeholder.markdown(full_response + " █")
-                                        time.sleep(0.01)
+                                        pause(0.01)
+                                    telemetry.record("ai_stream", time.perf_counter() - t_ai)
                                     
+                                    if cache_key: response_cache.put(cache_key, full_response)
                                     testo_colorato = colora_segnali(full_response)
                                     terminal_placeholder.markdown(testo_colorato, unsafe_allow_html=True)
                                     st.session_state.msgs.append({"role": "assistant", "content": testo_colorato})
@@ -470,4 +629,6 @@ elif st.session_state.page == "terminal" and st.session_state.logged_in:
                                     terminal_placeholder.error(f"Errore: {e}")
                             else: st.error(L['error_ai'])
 
+    telemetry.record("rerun", time.perf_counter() - t_rerun)
+
 st.markdown(f"<div style='text-align:center; color:#444; font-size:10px; margin-top:50px;'>{L['disclaimer']}</div>", unsafe_allow_html=True)
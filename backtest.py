@@ -0,0 +1,126 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from indicators import bbands, ema, rsi, sma
+
+# --- BACKTEST VETTORIALE ---
+# I segnali del grafico (soglie RSI, incrocio SMA20/SMA50, tocchi delle bande
+# di Bollinger, incrocio MACD/signal) trasformati in posizioni long/flat su una
+# matrice date x set di parametri: un'intera griglia si valuta in un solo passaggio.
+# Le posizioni entrano sulla barra successiva al segnale (niente look-ahead).
+DEFAULT_GRIDS = {
+    "rsi": {"length": [7, 14, 21], "lower": [20, 25, 30, 35], "upper": [65, 70, 75, 80]},
+    "sma_cross": {"fast": [10, 20, 30], "slow": [50, 100, 200]},
+    "bollinger": {"length": [10, 20, 30], "k": [1.5, 2.0, 2.5]},
+    "macd": {"fast": [8, 12], "slow": [21, 26], "signal": [5, 9]},
+}
+METRIC_COLUMNS = ["total_return", "ann_return", "ann_vol", "sharpe", "max_drawdown", "exposure", "trades", "hit_rate"]
+DEFAULT_PERIODS_PER_YEAR = 252
+
+
+def param_grid(**axes):
+    keys = list(axes)
+    return [dict(zip(keys, values)) for values in itertools.product(*(axes[k] for k in keys))]
+
+
+def bars_per_year(index, default=DEFAULT_PERIODS_PER_YEAR):
+    # Barre per anno solare dal calendario reale del simbolo: ~252 per le azioni, ~365 per le crypto
+    if not isinstance(index, pd.DatetimeIndex) or len(index) < 2: return default
+    days = (index[-1] - index[0]) / pd.Timedelta(days=1)
+    if days < 28: return default
+    return (len(index) - 1) / (days / 365.25)
+
+
+def _by_length(f, close, lengths):
+    # Un solo calcolo per lunghezza distinta, poi ridistribuito sulle colonne della griglia
+    uniq, inv = np.unique(lengths, return_inverse=True)
+    return np.column_stack([f(close, int(n)) for n in uniq])[:, inv]
+
+
+def _hold(enter, leave):
+    # Stato long/flat da eventi di ingresso e uscita: l'ultimo evento vince
+    event = np.where(enter, 1.0, np.where(leave, 0.0, np.nan))
+    idx = np.where(~np.isnan(event), np.arange(len(event))[:, None], 0)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    held = np.take_along_axis(event, idx, axis=0)
+    return np.nan_to_num(held, nan=0.0)
+
+
+def positions(close, strategy, grid):
+    close = np.asarray(close, dtype=float)
+    col = lambda key: np.array([p[key] for p in grid])
+    c = close[:, None]
+    if strategy == "rsi":
+        uniq, inv = np.unique(col("length"), return_inverse=True)
+        r = rsi(close, uniq)[:, inv]
+        return _hold(r < col("lower"), r > col("upper"))
+    if strategy == "sma_cross":
+        fast, slow = _by_length(sma, close, col("fast")), _by_length(sma, close, col("slow"))
+        return ((fast > slow) & ~np.isnan(slow)).astype(float)
+    if strategy == "bollinger":
+        # Banda a k=1 per lunghezza: la griglia su k scala solo la distanza dalla media
+        uniq, inv = np.unique(col("length"), return_inverse=True)
+        bands = [bbands(close, int(n), 1.0) for n in uniq]
+        mid = np.column_stack([b[1] for b in bands])[:, inv]
+        sd = np.column_stack([b[2] - b[1] for b in bands])[:, inv]
+        return _hold(c < mid - col("k") * sd, c > mid)
+    if strategy == "macd":
+        fast_n, slow_n, sig_n = col("fast"), col("slow"), col("signal")
+        uniq, inv = np.unique(np.concatenate((fast_n, slow_n)), return_inverse=True)
+        e = ema(close, uniq)[:, inv]
+        macd = e[:, :len(grid)] - e[:, len(grid):]
+        sig = ema(macd, sig_n)
+        return ((macd > sig) & ~np.isnan(sig)).astype(float)
+    raise ValueError(f"unknown strategy: {strategy}")
+
+
+def evaluate(close, pos, periods_per_year=DEFAULT_PERIODS_PER_YEAR, cost=0.0):
+    # cost: frazione pagata a ogni cambio di posizione (es. 0.001 = 10 bps)
+    close = np.asarray(close, dtype=float)
+    ret = np.zeros(len(close))
+    ret[1:] = close[1:] / close[:-1] - 1
+    held = np.vstack((np.zeros((1, pos.shape[1])), pos[:-1]))
+    turnover = np.abs(np.diff(held, axis=0, prepend=0.0))
+    strat = held * ret[:, None] - turnover * cost
+    equity = np.cumprod(1 + strat, axis=0)
+    drawdown = equity / np.maximum.accumulate(equity, axis=0) - 1
+
+    years = max(len(close) - 1, 1) / periods_per_year
+    total = equity[-1] - 1
+    vol = strat.std(axis=0) * np.sqrt(periods_per_year)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(vol > 0, strat.mean(axis=0) * periods_per_year / vol, np.nan)
+        ann = np.where(equity[-1] > 0, equity[-1] ** (1 / years) - 1, -1.0)
+
+    # Esito per operazione: id progressivo per ogni ingresso, somma dei log-rendimenti con bincount
+    entries = (np.diff(held, axis=0, prepend=0.0) > 0)
+    trades = entries.sum(axis=0)
+    trade_id = np.cumsum(entries, axis=0) * (held > 0)
+    width = int(trades.max()) + 1 if len(trades) else 1
+    flat_id = (trade_id + np.arange(pos.shape[1]) * width).ravel()
+    pnl = np.bincount(flat_id, weights=np.log1p(strat).ravel(), minlength=width * pos.shape[1]).reshape(pos.shape[1], width)[:, 1:]
+    wins = ((pnl > 0) & (np.arange(1, width) <= trades[:, None])).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hit = np.where(trades > 0, wins / trades, np.nan)
+
+    return pd.DataFrame({
+        "total_return": total * 100, "ann_return": ann * 100, "ann_vol": vol * 100, "sharpe": sharpe,
+        "max_drawdown": drawdown.min(axis=0) * 100, "exposure": held.mean(axis=0) * 100,
+        "trades": trades, "hit_rate": hit * 100,
+    })
+
+
+def sweep(close, strategy, grid=None, periods_per_year=None, cost=0.0):
+    # periods_per_year=None: ricavato dall'indice delle date (se c'e'), altrimenti 252
+    grid = grid if grid is not None else param_grid(**DEFAULT_GRIDS[strategy])
+    if strategy == "sma_cross": grid = [p for p in grid if p["fast"] < p["slow"]]
+    if strategy == "macd": grid = [p for p in grid if p["fast"] < p["slow"]]
+    close = pd.Series(close).dropna()
+    if periods_per_year is None: periods_per_year = bars_per_year(close.index)
+    close = close.to_numpy(dtype=float)
+    pos = positions(close, strategy, grid)
+    metrics = evaluate(close, pos, periods_per_year, cost)
+    result = pd.concat([pd.DataFrame(grid), metrics], axis=1)
+    return result.sort_values("sharpe", ascending=False, na_position="last").reset_index(drop=True)
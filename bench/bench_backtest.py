@@ -0,0 +1,79 @@
+# Benchmark del backtest: throughput delle sweep (set di parametri al secondo) su dati sintetici.
+#   python bench/bench_backtest.py [--sizes 1260,5000] [--scale 4]
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backtest import DEFAULT_GRIDS, METRIC_COLUMNS, param_grid, sweep  # noqa: E402
+
+TOLERANCE = 1e-9
+
+# Griglie piu' fitte di quelle del terminale, per misurare il costo per set di parametri
+BENCH_GRIDS = {
+    "rsi": lambda s: {"length": list(range(5, 5 + 3 * s)), "lower": list(range(15, 40, 5)), "upper": list(range(60, 90, 5))},
+    "sma_cross": lambda s: {"fast": list(range(5, 5 + 10 * s, 2)), "slow": list(range(40, 40 + 40 * s, 5))},
+    "bollinger": lambda s: {"length": list(range(10, 10 + 10 * s)), "k": [1.0, 1.5, 2.0, 2.5, 3.0]},
+    "macd": lambda s: {"fast": list(range(6, 6 + 3 * s)), "slow": list(range(20, 20 + 3 * s)), "signal": [5, 7, 9]},
+}
+
+
+def synthetic_close(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return 100 * np.exp(np.cumsum(rng.normal(0.0002, 0.02, n)))
+
+
+def best_of(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def mismatch(close, strategy, grid, sample=5):
+    # La sweep in blocco deve dare le stesse metriche dei singoli set valutati uno alla volta
+    batch = sweep(close, strategy, grid).set_index(list(grid[0]))
+    worst = 0.0
+    for p in grid[::max(len(grid) // sample, 1)]:
+        if strategy in ("sma_cross", "macd") and p["fast"] >= p["slow"]: continue
+        one = sweep(close, strategy, [p]).iloc[0]
+        row = batch.loc[tuple(p.values())]
+        for k in METRIC_COLUMNS:
+            a, b = float(one[k]), float(row[k])
+            if np.isnan(a) and np.isnan(b): continue
+            worst = max(worst, abs(a - b) / max(abs(a), 1.0))
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1260,5000")
+    parser.add_argument("--scale", type=int, default=4)
+    parser.add_argument("--strategies", default=",".join(DEFAULT_GRIDS))
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'strategy':>10} {'bars':>6} {'sets':>6} {'sweep ms':>9} {'sets/s':>9} {'single ms':>10} {'speedup':>8}")
+    for n in [int(s) for s in args.sizes.split(",")]:
+        close = synthetic_close(n)
+        for strategy in args.strategies.split(","):
+            grid = param_grid(**BENCH_GRIDS[strategy](args.scale))
+            sets = len(sweep(close, strategy, grid))
+            batch = best_of(lambda: sweep(close, strategy, grid))
+            single = best_of(lambda: sweep(close, strategy, grid[:1]))
+            print(f"{strategy:>10} {n:>6} {sets:>6} {batch * 1e3:>9.1f} {sets / batch:>9.0f} {single * 1e3:>10.2f} {single * sets / batch:>7.1f}x")
+
+            err = mismatch(close, strategy, grid)
+            if err > TOLERANCE:
+                print(f"  batch/single mismatch {err:.2e} > {TOLERANCE:.0e}")
+                failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
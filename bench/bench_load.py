@@ -0,0 +1,209 @@
+# Test di carico offline: molte sessioni simulate (AppTest) percorrono
+# landing -> auth -> terminal (-> chat) in parallelo contro servizi finti
+# con latenza configurabile. Riporta p50/p99 dei rerun per pagina e la memoria.
+#   python bench/bench_load.py [--sessions 40] [--concurrency 8] [--market-latency 0.2] [--json]
+import argparse
+import gc
+import itertools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+SEARCHES = ["Bitcoin", "nvidia", "AAPL", "tesla", "oro", "ETH", "microsoft", "petrolio"]
+QUESTIONS = ["Analisi tecnica?", "Conviene entrare ora?", "Livelli di supporto?"]
+# shared_runtime() sostituisce internals privati di streamlit.testing: versioni verificate
+STREAMLIT_TESTED = ((1, 65), (1, 66))
+
+
+def configure_env(args):
+    # Prima di qualsiasi import dell'app: alcuni moduli leggono l'ambiente all'import
+    os.environ["MARKET_CORE_BARS_DIR"] = tempfile.mkdtemp(prefix="market-core-bars-")
+    os.environ["MARKET_CORE_COSMETIC_DELAYS"] = "1" if args.cosmetic else "0"
+    os.environ.pop("MARKET_CORE_TIMINGS_PATH", None)
+
+
+def check_streamlit(force=False):
+    import streamlit
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    version = tuple(int(p) for p in streamlit.__version__.split(".")[:2])
+    missing = [name for mod, name in ((app_test, "Runtime"), (app_test, "ScriptCache"), (app_test, "patch_config_options"),
+                                      (app_test, "MemoryCacheStorageManager"), (local_script_runner, "ScriptCache")) if not hasattr(mod, name)]
+    if missing:
+        sys.exit(f"streamlit {streamlit.__version__}: internals mancanti per il test di carico ({', '.join(missing)})")
+    if version not in STREAMLIT_TESTED and not force:
+        tested = ", ".join(".".join(map(str, v)) for v in STREAMLIT_TESTED)
+        sys.exit(f"streamlit {streamlit.__version__} non verificato (testato con {tested}): "
+                 "aggiornare shared_runtime() e STREAMLIT_TESTED, oppure --force")
+
+
+def shared_runtime():
+    # AppTest crea e distrugge un Runtime finto globale a ogni run: sessioni in
+    # parallelo se lo cancellano a vicenda. Se ne installa uno solo, condiviso
+    # da tutte le sessioni come in un vero server, insieme alla cache del
+    # bytecode (lo script viene compilato una volta, non a ogni rerun).
+    import contextlib
+    from unittest.mock import MagicMock
+
+    from streamlit import config, logger
+    from streamlit.runtime import Runtime
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = app_test.MediaFileManager(app_test.MemoryMediaFileStorage("/mock/media"))
+    runtime.dataframe_source_mgr = app_test.DataframeSourceManager()
+    runtime.cache_storage_manager = app_test.MemoryCacheStorageManager()
+    if hasattr(app_test, "BidiComponentManager"):
+        runtime.bidi_component_registry = app_test.BidiComponentManager()
+        runtime.bidi_component_registry.discover_and_register_components(start_file_watching=False)
+    Runtime._instance = runtime
+    config.set_option("global.appTest", True)
+    config.set_option("logger.level", "error")
+    logger.set_log_level("error")
+    app_test.Runtime = type("Runtime", (), {})
+    script_cache = app_test.ScriptCache()
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+    app_test.patch_config_options = lambda options: contextlib.nullcontext()
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = []
+
+    def fail(self, message):
+        with self._lock: self.errors.append(message)
+
+    def run(self, page, at, action=None):
+        t0 = time.perf_counter()
+        (action(at) if action else at).run()
+        elapsed = time.perf_counter() - t0
+        with self._lock:
+            self.samples.setdefault(page, []).append(elapsed)
+            if at.exception: self.errors.append(f"{page}: {at.exception[0].message}")
+        return at
+
+
+def button(label):
+    return lambda at: next(b for b in at.button if b.label == label).click()
+
+
+def session(n, rec, args):
+    from streamlit.testing.v1 import AppTest
+
+    email, password = f"user{n}@loadtest.local", f"pw-{n}"
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=args.timeout)
+    rec.run("landing", at)
+    rec.run("auth", at, button("ACCEDI AL TERMINALE"))
+    at.text_input(key="reg_mail").input(email)
+    at.text_input(key="reg_pass").input(password)
+    rec.run("auth", at, button("CREA ACCOUNT CLOUD"))
+    at.text_input(key="login_mail").input(email)
+    at.text_input(key="login_pass").input(password)
+    rec.run("terminal", at, button("ENTRA NEL TERMINALE"))
+    for q in itertools.islice(itertools.cycle(SEARCHES[n % len(SEARCHES):] + SEARCHES), args.searches):
+        rec.run("terminal", at, lambda a: a.text_input(key="search_in").input(q))
+    for q in QUESTIONS[:args.questions]:
+        if not at.chat_input: break
+        rec.run("chat", at, lambda a: a.chat_input[0].set_value(q))
+    return at.session_state.page if "page" in at.session_state else None
+
+
+def safe_session(n, rec, args):
+    # Un'eccezione del driver (widget mancante, timeout) conta come errore senza fermare le altre sessioni
+    try:
+        return session(n, rec, args)
+    except Exception as e:
+        rec.fail(f"sessione {n}: {e!r}")
+        return None
+
+
+def percentile(values, q):
+    from telemetry import percentile as p
+    return p(sorted(values), q)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--searches", type=int, default=3)
+    parser.add_argument("--questions", type=int, default=1)
+    parser.add_argument("--market-latency", type=float, default=0.2)
+    parser.add_argument("--sheets-latency", type=float, default=0.3)
+    parser.add_argument("--ai-latency", type=float, default=0.8, help="attesa del primo chunk")
+    parser.add_argument("--ai-chunk-latency", type=float, default=0.05)
+    parser.add_argument("--rss-latency", type=float, default=0.15)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--cosmetic", action="store_true", help="mantiene le pause estetiche (boot, log chat)")
+    parser.add_argument("--no-memory", action="store_true", help="disattiva tracemalloc (rerun piu' veloci)")
+    parser.add_argument("--force", action="store_true", help="prova anche con una versione di streamlit non verificata")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    configure_env(args)
+    check_streamlit(args.force)
+    from fakes import Latency, install
+    shared_runtime()
+    counter, _ = install(Latency(market=args.market_latency, sheets=args.sheets_latency, ai_first=args.ai_latency,
+                                           ai_chunk=args.ai_chunk_latency, rss=args.rss_latency))
+
+    if not args.no_memory: tracemalloc.start()
+    # Una sessione di riscaldamento riempie le cache di processo (come un server gia' avviato)
+    warm = Recorder()
+    session(-1, warm, args)
+    gc.collect()
+    base = tracemalloc.get_traced_memory()[0] if not args.no_memory else 0
+    if not args.no_memory: tracemalloc.reset_peak()
+    calls_before = dict(counter.calls)
+
+    rec = Recorder()
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        landed = list(pool.map(lambda n: safe_session(n, rec, args), range(args.sessions)))
+    wall = time.perf_counter() - t0
+    gc.collect()
+
+    result = {
+        "sessions": args.sessions, "concurrency": args.concurrency, "wall_s": wall,
+        "reached_terminal": sum(p == "terminal" for p in landed),
+        "pages": {page: {"n": len(v), "p50_ms": percentile(v, 50) * 1e3, "p99_ms": percentile(v, 99) * 1e3, "max_ms": max(v) * 1e3}
+                  for page, v in rec.samples.items()},
+        "upstream_calls": {k: v - calls_before.get(k, 0) for k, v in sorted(counter.calls.items())},
+        "errors": rec.errors[:10], "error_count": len(rec.errors),
+    }
+    if not args.no_memory:
+        current, peak = tracemalloc.get_traced_memory()
+        result["memory"] = {"retained_mb": (current - base) / 2**20, "per_session_kb": (current - base) / 1024 / max(args.sessions, 1),
+                            "peak_mb": peak / 2**20}
+    try:
+        import resource
+        result.setdefault("memory", {})["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        pass
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"{result['sessions']} sessioni, concorrenza {result['concurrency']}, {wall:.1f}s, terminale raggiunto: {result['reached_terminal']}")
+        print(f"{'page':<10} {'reruns':>7} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        for page, row in result["pages"].items():
+            print(f"{page:<10} {row['n']:>7} {row['p50_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['max_ms']:>9.1f}")
+        print("memoria: " + ", ".join(f"{k}={v:.1f}" for k, v in result.get("memory", {}).items()))
+        print("chiamate upstream: " + ", ".join(f"{k}={v}" for k, v in result["upstream_calls"].items()))
+        for e in result["errors"]: print(f"  errore {e}")
+    sys.exit(1 if rec.errors or result["reached_terminal"] < args.sessions else 0)
+
+
+if __name__ == "__main__":
+    main()
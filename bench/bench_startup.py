@@ -0,0 +1,84 @@
+# Benchmark di avvio a freddo: tempo di import delle dipendenze di ogni pagina e
+# tempo al primo render (AppTest) in un interprete nuovo per ogni misura.
+#   python bench/bench_startup.py [--repeat 5] [--pages landing,auth] [--json]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASE = ["streamlit", "ai_client", "analytics", "database"]
+PAGES = {
+    "landing": {"modules": BASE, "state": {}},
+    "auth": {"modules": BASE + ["gspread", "oauth2client.service_account"], "state": {"page": "auth"}},
+    "terminal": {
+        "modules": BASE + ["numpy", "pandas", "yfinance", "plotly.graph_objects", "plotly.subplots", "market_data", "indicators", "charting", "valuation", "backtest", "symbols"],
+        "state": {"page": "terminal", "logged_in": True, "terminal_booted": True, "user_email": "bench@market-core"},
+    },
+    "chat": {"modules": BASE + ["google.generativeai"], "state": None},
+}
+
+IMPORT_SNIPPET = """
+import sys, time
+sys.path.insert(0, {root!r})
+t0 = time.perf_counter()
+for m in {modules!r}: __import__(m)
+print(time.perf_counter() - t0)
+"""
+
+RENDER_SNIPPET = """
+import sys, time
+sys.path.insert(0, {root!r})
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=60)
+for k, v in {state!r}.items(): at.session_state[k] = v
+at.run()
+elapsed = time.perf_counter() - t0
+if at.exception: sys.exit("render failed: " + str(at.exception[0].message))
+print(elapsed)
+"""
+
+
+def measure(snippet, repeat):
+    samples = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", snippet], capture_output=True, text=True, cwd=ROOT)
+        if out.returncode != 0: raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr else "failed")
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--pages", default=",".join(PAGES))
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    results = {}
+    for page in args.pages.split(","):
+        spec = PAGES[page]
+        row = {"import_s": measure(IMPORT_SNIPPET.format(root=ROOT, modules=spec["modules"]), args.repeat)}
+        if spec["state"] is not None:
+            try:
+                snippet = RENDER_SNIPPET.format(root=ROOT, app=os.path.join(ROOT, "app.py"), state=spec["state"])
+                row["first_render_s"] = measure(snippet, args.repeat)
+            except RuntimeError as e:
+                row["first_render_s"], row["error"] = None, str(e)
+        results[page] = row
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'page':<10} {'import s':>9} {'first render s':>15}")
+    for page, row in results.items():
+        render = row.get("first_render_s")
+        render = f"{render:>15.3f}" if render is not None else f"{'-':>15}"
+        print(f"{page:<10} {row['import_s']:>9.3f} {render}  {row.get('error', '')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+# Sostituti locali e deterministici dei servizi esterni (yfinance, Google Sheets,
+# Gemini, RSS di Google News) per i benchmark offline. Ogni finto servizio ha
+# una latenza configurabile e conta le chiamate ricevute.
+#   from fakes import Latency, install
+#   counter, spreadsheet = install(Latency(market=0.2, sheets=0.3))
+import io
+import json
+import os
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from email.utils import formatdate
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+FAKE_CREDENTIALS = json.dumps({"type": "service_account", "client_email": "loadtest@market-core.local"})
+
+
+@dataclass
+class Latency:
+    market: float = 0.0
+    sheets: float = 0.0
+    ai_first: float = 0.0
+    ai_chunk: float = 0.0
+    rss: float = 0.0
+
+
+class Counter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = {}
+
+    def hit(self, name):
+        with self._lock: self.calls[name] = self.calls.get(name, 0) + 1
+
+
+def _seed(text):
+    return zlib.crc32(text.encode("utf-8"))
+
+
+# --- MERCATO ---
+class FakeMarket:
+    def __init__(self, latency, counter, bars=1300):
+        self.latency = latency
+        self.counter = counter
+        self.bars = bars
+
+    def history(self, symbol):
+        # Serie GBM riproducibile per simbolo, che termina all'ultima seduta
+        rng = np.random.default_rng(_seed(symbol))
+        idx = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=self.bars)
+        close = (20 + rng.uniform(0, 500)) * np.exp(np.cumsum(rng.normal(0.0003, 0.02, self.bars)))
+        spread = np.abs(rng.normal(0, 0.01, self.bars)) * close
+        return pd.DataFrame({"Open": np.r_[close[0], close[:-1]], "High": close + spread, "Low": close - spread,
+                             "Close": close, "Volume": rng.integers(10**5, 10**7, self.bars).astype(float)}, index=idx)
+
+    def download(self, tickers, period=None, start=None, interval="1d", group_by="column", **kwargs):
+        self.counter.hit("yf.download")
+        time.sleep(self.latency.market)
+        symbols = [tickers] if isinstance(tickers, str) else list(tickers)
+        frames = {}
+        for s in symbols:
+            df = self.history(s)
+            if start is not None: df = df[df.index >= pd.Timestamp(start)]
+            elif period == "5d": df = df.iloc[-5:]
+            frames[s] = df
+        data = pd.concat(frames, axis=1)
+        if group_by != "ticker": data = data.swaplevel(0, 1, axis=1).sort_index(axis=1)
+        return data
+
+
+# --- GOOGLE SHEETS ---
+class FakeSpreadsheet:
+    def __init__(self, latency, counter, tabs):
+        self.latency = latency
+        self.counter = counter
+        self._lock = threading.Lock()
+        self._tabs = {name: FakeWorksheet(self, i, name, rows) for i, (name, rows) in enumerate(tabs.items())}
+
+    def worksheet(self, name):
+        return self._tabs[name]
+
+    def batch_update(self, body):
+        self.counter.hit("sheets.batch_update")
+        time.sleep(self.latency.sheets)
+        with self._lock:
+            for req in body.get("requests", []):
+                rng = req["deleteDimension"]["range"]
+                ws = next(w for w in self._tabs.values() if w.id == rng["sheetId"])
+                del ws.rows[rng["startIndex"]:rng["endIndex"]]
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet, sheet_id, title, rows):
+        self.spreadsheet = spreadsheet
+        self.id = sheet_id
+        self.title = title
+        self.rows = [list(r) for r in rows]
+
+    def get_all_values(self):
+        self.spreadsheet.counter.hit("sheets.read")
+        time.sleep(self.spreadsheet.latency.sheets)
+        with self.spreadsheet._lock: return [list(r) for r in self.rows]
+
+    def append_rows(self, rows):
+        self.spreadsheet.counter.hit("sheets.append")
+        time.sleep(self.spreadsheet.latency.sheets)
+        with self.spreadsheet._lock: self.rows.extend(list(r) for r in rows)
+
+
+class FakeSheetsClient:
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+
+    def open_by_key(self, key):
+        return self.spreadsheet
+
+
+# --- GEMINI ---
+class FakeModel:
+    def __init__(self, name, latency, counter):
+        self.name = name
+        self.latency = latency
+        self.counter = counter
+
+    def generate_content(self, prompt, stream=False):
+        self.counter.hit("genai.generate")
+        words = (f"Analisi sintetica ({len(prompt)} caratteri di contesto): momentum BULLISH sul breve, "
+                 "supporti tenuti, volumi in linea con la media. Outlook: BUY con stop sotto la SMA 50.").split(" ")
+        chunks = [type("Chunk", (), {"text": " ".join(words[i:i + 4]) + " "})() for i in range(0, len(words), 4)]
+
+        def gen():
+            time.sleep(self.latency.ai_first)
+            for i, c in enumerate(chunks):
+                if i: time.sleep(self.latency.ai_chunk)
+                yield c
+        return gen() if stream else chunks
+
+
+class FakeGenai:
+    def __init__(self, latency, counter):
+        self.latency = latency
+        self.counter = counter
+
+    def configure(self, api_key=None, **kwargs):
+        self.counter.hit("genai.configure")
+
+    def list_models(self):
+        self.counter.hit("genai.list_models")
+        model = type("Model", (), {"name": "models/gemini-1.5-flash", "supported_generation_methods": ["generateContent"]})
+        return [model()]
+
+    def GenerativeModel(self, name):
+        return FakeModel(name, self.latency, self.counter)
+
+
+# --- GOOGLE NEWS RSS ---
+def rss_feed(query, items=20):
+    body = "".join(f"<item><title>{escape(query)} headline {i}</title><link>https://news.local/{_seed(query)}/{i}</link></item>" for i in range(items))
+    return f"<?xml version='1.0' encoding='UTF-8'?><rss><channel><title>{escape(query)}</title>{body}</channel></rss>".encode("utf-8")
+
+
+def feed_adapter(latency, counter):
+    import requests
+    from requests.adapters import HTTPAdapter
+    from requests.structures import CaseInsensitiveDict
+
+    class FakeFeedAdapter(HTTPAdapter):
+        # Risponde al posto della rete; ETag fisso per query, quindi le rivalidazioni ricevono 304
+        def send(self, request, **kwargs):
+            counter.hit("rss.get")
+            time.sleep(latency.rss)
+            query = requests.utils.unquote(request.url.split("q=", 1)[-1].split("&", 1)[0]).replace("+", " ")
+            etag = f'"{_seed(query)}"'
+            r = requests.Response()
+            r.request, r.url = request, request.url
+            r.headers = CaseInsensitiveDict({"ETag": etag, "Last-Modified": formatdate(usegmt=True)})
+            if request.headers.get("If-None-Match") == etag:
+                r.status_code, r.raw = 304, io.BytesIO(b"")
+            else:
+                r.status_code, r.raw = 200, io.BytesIO(rss_feed(query))
+            return r
+
+    return FakeFeedAdapter
+
+
+# --- INSTALLAZIONE ---
+def install(latency=None, users=(), portfolio=()):
+    # Sostituisce i punti di ingresso verso l'esterno; va chiamata prima del primo run dell'app
+    import google.generativeai
+    import gspread
+    import news
+    import yfinance
+    from oauth2client.service_account import ServiceAccountCredentials
+
+    from database import PORTFOLIO_HEADER
+
+    latency = latency or Latency()
+    counter = Counter()
+    market = FakeMarket(latency, counter)
+    spreadsheet = FakeSpreadsheet(latency, counter, {
+        "Utenti": [["email", "password"]] + [list(u) for u in users],
+        "Portafoglio": [PORTFOLIO_HEADER] + [list(r) for r in portfolio],
+        "Visite": [["data", "evento"]],
+    })
+    genai = FakeGenai(latency, counter)
+
+    yfinance.download = market.download
+    gspread.authorize = lambda creds: FakeSheetsClient(spreadsheet)
+    ServiceAccountCredentials.from_json_keyfile_dict = classmethod(lambda cls, d, scope=None: object())
+    google.generativeai.configure = genai.configure
+    google.generativeai.list_models = genai.list_models
+    google.generativeai.GenerativeModel = genai.GenerativeModel
+    news.HTTPAdapter = feed_adapter(latency, counter)
+
+    os.environ["GOOGLE_CREDENTIALS"] = FAKE_CREDENTIALS
+    os.environ.setdefault("GEMINI_API_KEY", "loadtest-key")
+    return counter, spreadsheet
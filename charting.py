@@ -0,0 +1,144 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+# --- RENDERING GRAFICO ---
+# Il browser non puo' mostrare piu' punti dei pixel disponibili: oltre
+# MAX_CANDLES le candele vengono aggregate in bucket OHLC, oltre MAX_POINTS
+# le linee passano per LTTB. Sopra GL_THRESHOLD punti si usa WebGL.
+MAX_CANDLES = 600
+MAX_POINTS = 1500
+GL_THRESHOLD = 1000
+TRACE_COLUMNS = {"SMA 20": "SMA20", "SMA 50": "SMA50", "BB Sup": "BBU", "BB Inf": "BBL", "MACD": "MACD", "Signal": "MACD_sig", "RSI": "RSI"}
+
+
+def lttb_indices(y, threshold):
+    # Largest-Triangle-Three-Buckets: indici dei punti che preservano la forma della serie
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if threshold >= n or threshold < 3: return np.arange(n)
+    y = np.where(np.isnan(y), np.nanmean(y) if (~np.isnan(y)).any() else 0.0, y)
+    x = np.arange(n, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    out = np.empty(threshold, dtype=int)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        nlo, nhi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[nlo:max(nhi, nlo + 1)].mean(), y[nlo:max(nhi, nlo + 1)].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def ohlc_buckets(df, max_bars):
+    # Bucket allineati alla fine: l'ultima candela resta quella reale piu' recente
+    n = len(df)
+    if n <= max_bars: return df
+    k = -(-n // max_bars)
+    ends = np.arange(n - 1, -1, -k)[::-1]
+    starts = np.r_[0, ends[:-1] + 1]
+    out = df.iloc[ends].copy()
+    out.index = df.index[starts]
+    out["Open"] = df["Open"].to_numpy()[starts]
+    out["High"] = np.fmax.reduceat(df["High"].to_numpy(dtype=float), starts)
+    out["Low"] = np.fmin.reduceat(df["Low"].to_numpy(dtype=float), starts)
+    if "Volume" in df.columns: out["Volume"] = np.add.reduceat(np.nan_to_num(df["Volume"].to_numpy(dtype=float)), starts)
+    return out
+
+
+def downsample(df, candles, max_candles=MAX_CANDLES, max_points=MAX_POINTS):
+    if candles: return ohlc_buckets(df, max_candles)
+    if len(df) <= max_points: return df
+    return df.iloc[lttb_indices(df["Close"].to_numpy(), max_points)]
+
+
+def build_figure(df, candles, indicators, price_label):
+    df = downsample(df, candles)
+    line = go.Scattergl if len(df) > GL_THRESHOLD else go.Scatter
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.7, 0.3], vertical_spacing=0.05)
+
+    if candles:
+        fig.add_trace(go.Candlestick(x=df.index, open=df['Open'], high=df['High'], low=df['Low'], close=df['Close'], name=price_label), row=1, col=1)
+    else:
+        fig.add_trace(line(x=df.index, y=df['Close'], name=price_label, line=dict(color='#00ff41', width=2)), row=1, col=1)
+
+    if "SMA 20" in indicators: fig.add_trace(line(x=df.index, y=df['SMA20'], name="SMA 20", line=dict(color='orange', width=1.5)), row=1, col=1)
+    if "SMA 50" in indicators: fig.add_trace(line(x=df.index, y=df['SMA50'], name="SMA 50", line=dict(color='yellow', width=1.5)), row=1, col=1)
+    if "Bande di Bollinger" in indicators and 'BBU' in df.columns:
+        fig.add_trace(line(x=df.index, y=df['BBU'], name="BB Sup", line=dict(color='rgba(255,0,255,0.6)', dash='dot')), row=1, col=1)
+        fig.add_trace(line(x=df.index, y=df['BBL'], name="BB Inf", line=dict(color='rgba(255,0,255,0.6)', dash='dot')), row=1, col=1)
+
+    if "MACD" in indicators and 'MACD' in df.columns:
+        fig.add_trace(line(x=df.index, y=df['MACD'], name="MACD", line=dict(color='#00ff41')), row=2, col=1)
+        fig.add_trace(line(x=df.index, y=df['MACD_sig'], name="Signal", line=dict(color='orange')), row=2, col=1)
+    else:
+        fig.add_trace(line(x=df.index, y=df['RSI'], name="RSI", line=dict(color='magenta', width=1.5)), row=2, col=1)
+        fig.add_hline(y=70, line_dash="dot", line_color="red", row=2, col=1)
+        fig.add_hline(y=30, line_dash="dot", line_color="cyan", row=2, col=1)
+
+    fig.update_layout(template="plotly_dark", height=550, xaxis_rangeslider_visible=False, margin=dict(l=0,r=0,t=10,b=0), legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
+    return fig
+
+
+def _with_last(values, value):
+    out = np.array(values, dtype=float)
+    out[-1] = value
+    return out
+
+
+def patch_last(fig, df):
+    # Cambia solo la barra in formazione: copia superficiale delle tracce (gli
+    # array non toccati restano condivisi, nessuno li modifica sul posto) e nuovo
+    # ultimo punto per ciascuna. L'ultimo punto e' sempre l'ultima barra
+    # (bucket allineati alla fine, LTTB conserva l'estremo).
+    last = df.iloc[-1]
+    spec = {"data": [dict(t.to_plotly_json()) for t in fig.data], "layout": fig.layout.to_plotly_json()}
+    for trace in spec["data"]:
+        if trace.get("type") == "candlestick":
+            trace["high"] = _with_last(trace["high"], max(trace["high"][-1], last["High"]))
+            trace["low"] = _with_last(trace["low"], min(trace["low"][-1], last["Low"]))
+            trace["close"] = _with_last(trace["close"], last["Close"])
+        elif "y" in trace:
+            trace["y"] = _with_last(trace["y"], last[TRACE_COLUMNS.get(trace.get("name"), "Close")])
+    return go.Figure(spec, _validate=False)
+
+
+class FigureCache:
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._latest = OrderedDict()
+
+    @staticmethod
+    def key(symbol, period, style, indicators, price_label, df):
+        # (vista, forma della serie, ultima barra): una candela aggiornata invalida la figura.
+        # La prima chiusura nella forma: uno storico ri-rettificato non viene mai corretto in place
+        last = df.iloc[-1]
+        return ((symbol, period, style, tuple(sorted(indicators)), price_label), (len(df), df.index[-1], float(df["Close"].iloc[0])),
+                (float(last["Close"]), float(last["High"]), float(last["Low"])))
+
+    def get(self, key, build, patch=None):
+        view, shape, _ = key
+        with self._lock:
+            fig = self._entries.get(key)
+            if fig is not None:
+                self._entries.move_to_end(key)
+                return fig
+            base = self._latest.get(view)
+        # Stesse barre e stessa ultima data: basta correggere l'ultima candela della figura precedente
+        if patch is not None and base is not None and base[0] == shape: fig = patch(base[1])
+        else: fig = build()
+        with self._lock:
+            self._entries[key] = fig
+            self._latest[view] = (shape, fig)
+            self._latest.move_to_end(view)
+            while len(self._entries) > self.max_entries: self._entries.popitem(last=False)
+            while len(self._latest) > self.max_entries: self._latest.popitem(last=False)
+        return fig
@@ -0,0 +1,288 @@
+import atexit
+import csv
+import hmac
+import json
+import os
+import threading
+import time
+
+# --- CONNESSIONE GOOGLE SHEETS ---
+# Aperta una sola volta per processo; gspread e oauth2client vengono importati
+# solo qui, cosi' le pagine che non usano il database non ne pagano l'import.
+SHEET_KEY = "1DJesdyf6AeyotOzBqzq-SJGKGe93v_kK6RXNB0LC_ck"
+_sheets_lock = threading.Lock()
+_sheets = {}
+
+
+def open_sheets(creds_json):
+    with _sheets_lock:
+        if creds_json not in _sheets:
+            try:
+                if not creds_json: raise ValueError("missing credentials")
+                import gspread
+                from oauth2client.service_account import ServiceAccountCredentials
+                creds_dict = json.loads(creds_json)
+                scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
+                creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
+                client = gspread.authorize(creds)
+                sheet = client.open_by_key(SHEET_KEY)
+                _sheets[creds_json] = (sheet.worksheet("Utenti"), sheet.worksheet("Portafoglio"), sheet.worksheet("Visite"))
+            except Exception:
+                _sheets[creds_json] = (None, None, None)
+        return _sheets[creds_json]
+
+# --- BACKEND ---
+# Un backend espone il foglio come lista di righe: lettura completa, append
+# in blocco e cancellazione in blocco per indice (0-based, intestazione inclusa).
+
+
+class SheetsBackend:
+    def __init__(self, worksheet):
+        self.ws = worksheet
+
+    def read_all(self):
+        return self.ws.get_all_values()
+
+    def append_rows(self, rows):
+        self.ws.append_rows(rows)
+
+    def delete_rows(self, indices):
+        # Una sola batch_update: le righe vanno cancellate dal basso verso l'alto
+        requests = [
+            {"deleteDimension": {"range": {"sheetId": self.ws.id, "dimension": "ROWS", "startIndex": i, "endIndex": i + 1}}}
+            for i in sorted(indices, reverse=True)
+        ]
+        if requests: self.ws.spreadsheet.batch_update({"requests": requests})
+
+
+class CsvBackend:
+    def __init__(self, path, header=None):
+        self.path = path
+        self._lock = threading.Lock()
+        if header and not os.path.exists(path):
+            with open(path, "w", newline="", encoding="utf-8") as f: csv.writer(f, lineterminator="\n").writerow(header)
+
+    def read_all(self):
+        with self._lock:
+            if not os.path.exists(self.path): return []
+            with open(self.path, newline="", encoding="utf-8") as f: return [row for row in csv.reader(f)]
+
+    def append_rows(self, rows):
+        with self._lock:
+            with open(self.path, "a", newline="", encoding="utf-8") as f: csv.writer(f, lineterminator="\n").writerows(rows)
+
+    def delete_rows(self, indices):
+        drop = set(indices)
+        rows = [r for i, r in enumerate(self.read_all()) if i not in drop]
+        with self._lock:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", newline="", encoding="utf-8") as f: csv.writer(f, lineterminator="\n").writerows(rows)
+            os.replace(tmp, self.path)
+
+
+# --- REPOSITORY PORTAFOGLIO ---
+# Indice in memoria per email con aggiornamenti ottimistici; le scritture
+# vengono accodate, compattate e inviate in blocco da un thread in background.
+PORTFOLIO_HEADER = ["Email", "Ticker", "Prezzo", "Quantità", "Totale", "Data"]
+
+
+def _locate_rows(sheet, rows):
+    # Le righe si cercano per contenuto (email, ticker, prezzo, quantita', data):
+    # altre repliche o modifiche manuali possono averne spostato gli indici
+    width = len(PORTFOLIO_HEADER)
+    taken, indices, missing = set(), [], []
+    for row in rows:
+        key = [v.strip() for v in row[:width]]
+        i = next((i for i, r in enumerate(sheet) if i not in taken and [v.strip() for v in r[:width]] == key), None)
+        if i is None: missing.append(row)
+        else:
+            taken.add(i)
+            indices.append(i)
+    return indices, missing
+
+
+class PortfolioRepository:
+    def __init__(self, backend, flush_delay=1.0, reload_every=300, retry_delay=5.0, max_retry_delay=120.0, max_failures=6):
+        self.backend = backend
+        self.flush_delay = flush_delay
+        self.reload_every = reload_every
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_failures = max_failures
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._index = {}
+        self._to_append = []
+        self._to_delete = []
+        self._inflight = []
+        self._loaded_at = 0
+        self._wake = threading.Event()
+        self._failures = 0
+        self.last_error = None
+        self.dropped = 0
+        self.reload()
+        self._thread = threading.Thread(target=self._run, name="portfolio-writer", daemon=True)
+        self._thread.start()
+        # Allo spegnimento si scrive subito quanto e' ancora nella finestra di coalescenza
+        atexit.register(self.close)
+
+    def reload(self):
+        with self._flush_lock:
+            rows = self.backend.read_all()
+            with self._lock:
+                if self._to_append or self._to_delete: return False
+                self._index = {}
+                for r in rows:
+                    if len(r) >= 4 and r[0] != PORTFOLIO_HEADER[0]: self._index.setdefault(r[0], []).append(r)
+                self._loaded_at = time.time()
+        return True
+
+    def rows(self, email):
+        if time.time() - self._loaded_at > self.reload_every:
+            try: self.reload()
+            except Exception: pass
+        with self._lock:
+            return [list(r) for r in self._index.get(email, [])]
+
+    def add(self, row):
+        row = [str(v) for v in row]
+        with self._lock:
+            self._index.setdefault(row[0], []).append(row)
+            self._to_append.append(row)
+        self._wake.set()
+        return row
+
+    def delete(self, email, ticker):
+        with self._lock:
+            rows = self._index.get(email, [])
+            row = next((r for r in rows if len(r) >= 2 and r[1].upper() == ticker.upper()), None)
+            if row is None: return False
+            rows.remove(row)
+            # Aggiunta non ancora scritta: si annullano entrambe le operazioni
+            if any(r is row for r in self._to_append) and not any(r is row for r in self._inflight):
+                self._to_append = [r for r in self._to_append if r is not row]
+            else:
+                self._to_delete.append(row)
+        self._wake.set()
+        return True
+
+    def pending(self):
+        with self._lock:
+            return len(self._to_append) + len(self._to_delete)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                to_delete, to_append = list(self._to_delete), list(self._to_append)
+                self._inflight = to_append
+            try:
+                if to_delete:
+                    # Foglio riletto una volta per batch: gli indici valgono solo per questa lettura
+                    indices, _ = _locate_rows(self.backend.read_all(), to_delete)
+                    # Lotto cancellato con l'aggiunta ancora in coda (era in volo ed e' fallita): l'aggiunta
+                    # si annulla, e la riga si cancella solo se sul foglio c'e' davvero
+                    cancelled = [a for a in to_append if any(a is d for d in to_delete)]
+                    to_append = [a for a in to_append if not any(a is c for c in cancelled)]
+                    if indices: self.backend.delete_rows(indices)
+                    with self._lock:
+                        self._to_delete = [r for r in self._to_delete if not any(r is d for d in to_delete)]
+                        self._to_append = [r for r in self._to_append if not any(r is c for c in cancelled)]
+                        self._inflight = to_append
+                if to_append: self.backend.append_rows(to_append)
+                with self._lock:
+                    self._to_append = [r for r in self._to_append if not any(r is a for a in to_append)]
+                self.last_error, self._failures = None, 0
+            except Exception as e:
+                # Le operazioni restano in coda e verranno ritentate
+                self.last_error = e
+                self._failures += 1
+                return False
+            finally:
+                with self._lock: self._inflight = []
+        return True
+
+    def _give_up(self):
+        # Scrittura impossibile in modo persistente (permessi, quota): le operazioni in coda
+        # si scartano e l'indice torna a riflettere il foglio invece di mostrare righe fantasma
+        with self._lock:
+            for row in self._to_append:
+                self._index[row[0]] = [r for r in self._index.get(row[0], []) if r is not row]
+            for row in self._to_delete:
+                if not any(row is a for a in self._to_append): self._index.setdefault(row[0], []).append(row)
+            self.dropped += len(self._to_append) + len(self._to_delete)
+            self._to_append, self._to_delete = [], []
+            self._failures = 0
+        try: self.reload()
+        except Exception: pass
+
+    def close(self):
+        if self.pending(): self.flush()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            # Finestra di coalescenza: clic ravvicinati finiscono nello stesso batch
+            time.sleep(self.flush_delay)
+            self._wake.clear()
+            try: ok = self.flush()
+            except Exception as e:
+                # Il writer non deve mai morire: le operazioni restano in coda
+                self.last_error, ok = e, False
+                self._failures += 1
+            if ok: continue
+            if self._failures >= self.max_failures:
+                self._give_up()
+                continue
+            # Backoff esponenziale: un foglio in errore non consuma la quota a ritmo fisso
+            time.sleep(min(self.retry_delay * 2 ** (self._failures - 1), self.max_retry_delay))
+            self._wake.set()
+
+
+# --- DIRECTORY UTENTI ---
+# Mappa email -> hash caricata una volta per processo: il login non tocca il
+# foglio dopo il warm-up e la registrazione rileva i duplicati in O(1).
+class UserDirectory:
+    def __init__(self, backend, miss_reload=60):
+        self.backend = backend
+        self.miss_reload = miss_reload
+        self._lock = threading.Lock()
+        self._users = None
+        self._loaded_at = 0
+
+    def _load(self):
+        users = {}
+        for row in self.backend.read_all():
+            if len(row) >= 2 and row[0]: users.setdefault(row[0], []).append(row[1])
+        self._users = users
+        self._loaded_at = time.time()
+
+    def _get(self, email):
+        with self._lock:
+            if self._users is None: self._load()
+            record = self._users.get(email)
+            # Un'email sconosciuta puo' essere stata registrata da un'altra replica
+            if record is None and time.time() - self._loaded_at > self.miss_reload:
+                self._load()
+                record = self._users.get(email)
+            return record
+
+    def authenticate(self, email, password_hash):
+        record = self._get(email) or []
+        # Sul foglio possono esistere righe duplicate create prima di questo controllo
+        return any(hmac.compare_digest(h.encode(), password_hash.encode()) for h in record)
+
+    def exists(self, email):
+        return self._get(email) is not None
+
+    def register(self, email, password_hash):
+        if self.exists(email): return False
+        with self._lock:
+            # Un invalidate() concorrente puo' aver svuotato la mappa dopo exists()
+            if self._users is None: self._load()
+            if email in self._users: return False
+            self.backend.append_rows([[email, password_hash]])
+            self._users[email] = [password_hash]
+        return True
+
+    def invalidate(self):
+        with self._lock: self._users = None
@@ -0,0 +1,277 @@
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+import pandas as pd
+
+# --- MOTORE INDICATORI ---
+# Stessa semantica di pandas_ta (rsi, sma, bbands, macd) ma calcolata in un
+# solo passaggio su array contigui. Lo stato rolling (medie di Wilder, EMA,
+# somme mobili) resta nel motore: una nuova barra costa O(1).
+COLUMNS = ["RSI", "SMA20", "SMA50", "BBL", "BBM", "BBU", "MACD", "MACD_hist", "MACD_sig"]
+
+
+def _ffill(x):
+    valid = ~np.isnan(x)
+    idx = np.where(valid, np.arange(len(x)), 0)
+    np.maximum.accumulate(idx, out=idx)
+    out = x[idx]
+    out[:np.argmax(valid) if valid.any() else len(x)] = np.nan
+    return out
+
+
+def _windows(x, n):
+    # Finestre mobili come viste sull'array (nessuna copia) lungo l'asse del
+    # tempo; vale anche per matrici (date x simboli). Come in pandas una
+    # finestra con un NaN produce NaN.
+    x = np.asarray(x, dtype=float)
+    out = np.full(x.shape, np.nan)
+    if len(x) < n: return out, None
+    return out, np.lib.stride_tricks.sliding_window_view(x, n, axis=0)
+
+
+def sma(x, n):
+    out, w = _windows(x, n)
+    if w is not None: out[n - 1:] = w.mean(axis=-1)
+    return out
+
+
+def bbands(x, n=20, k=2.0):
+    mid, w = _windows(x, n)
+    std = np.full(mid.shape, np.nan)
+    if w is not None:
+        mid[n - 1:] = w.mean(axis=-1)
+        std[n - 1:] = w.std(axis=-1)
+    return mid - k * std, mid, mid + k * std
+
+
+def _columns(x, n):
+    # Serie 1D o matrice (date x colonne); n scalare o una lunghezza per colonna
+    x = np.asarray(x, dtype=float)
+    n = np.asarray(n)
+    flat = x.ndim == 1 and n.ndim == 0
+    if x.ndim == 1: x = x[:, None]
+    if n.ndim: x = np.broadcast_to(x, (len(x), len(n)))
+    return x, n, flat
+
+
+def rsi(x, n=14):
+    # Versione vettoriale su piu' simboli (o piu' lunghezze): ciclo sul tempo, operazioni sulle colonne.
+    # Un NaN fa decadere i pesi senza aggiungere osservazioni, come ewm(ignore_na=False).
+    x, n, flat = _columns(x, n)
+    d = np.diff(x, axis=0, prepend=np.nan)
+    valid = ~np.isnan(d)
+    gain, loss = np.where(d > 0, d, 0.0), np.where(d < 0, -d, 0.0)
+    w = 1 - 1.0 / n
+    num_g, num_l = np.zeros(x.shape[1]), np.zeros(x.shape[1])
+    cnt = np.zeros(x.shape[1], dtype=int)
+    out = np.full(x.shape, np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for t in range(len(x)):
+            v = valid[t]
+            num_g = w * num_g + np.where(v, gain[t], 0.0)
+            num_l = w * num_l + np.where(v, loss[t], 0.0)
+            cnt += v
+            out[t] = np.where(cnt >= n, 100.0 * num_g / (num_g + num_l), np.nan)
+    return out[:, 0] if flat else out
+
+
+def ema(x, n):
+    # EMA con seed SMA sulle prime n osservazioni valide (come pandas_ta); i NaN
+    # iniziali vengono saltati, quindi si applica anche a serie derivate come il MACD.
+    x, n, flat = _columns(x, n)
+    a = 2.0 / (n + 1)
+    total, e = np.zeros(x.shape[1]), np.full(x.shape[1], np.nan)
+    cnt = np.zeros(x.shape[1], dtype=int)
+    out = np.full(x.shape, np.nan)
+    for t in range(len(x)):
+        v = x[t]
+        ok = ~np.isnan(v)
+        cnt += ok
+        total = np.where(ok & (cnt <= n), total + np.nan_to_num(v), total)
+        e = np.where(ok & (cnt == n), total / n, np.where(ok & (cnt > n), a * v + (1 - a) * e, e))
+        out[t] = np.where(cnt >= n, e, np.nan)
+    return out[:, 0] if flat else out
+
+
+class IndicatorEngine:
+    def __init__(self, rsi_length=14, sma_lengths=(20, 50), bb_length=20, bb_std=2.0,
+                 macd_fast=12, macd_slow=26, macd_signal=9):
+        self.rsi_length = rsi_length
+        self.sma_lengths = tuple(sma_lengths)
+        self.bb_length = bb_length
+        self.bb_std = bb_std
+        self.macd_fast, self.macd_slow, self.macd_signal = macd_fast, macd_slow, macd_signal
+        self._window_len = max(self.sma_lengths + (bb_length,))
+        self.reset()
+
+    def reset(self):
+        self._prev_close = None
+        # RSI: medie di Wilder "adjust=True" come pandas_ta (numeratore/denominatore)
+        self._gain = self._loss = self._den = 0.0
+        self._rsi_n = 0
+        # EMA con seed SMA: [somma seed, conteggio, valore]
+        self._ema = {"fast": [0.0, 0, None], "slow": [0.0, 0, None], "signal": [0.0, 0, None]}
+        self._window = deque(maxlen=self._window_len + 1)
+        self._ref = None
+        self._sums = {n: 0.0 for n in set(self.sma_lengths + (self.bb_length,))}
+        self._sumsq = 0.0
+        self._last = None
+        self._undo = None
+
+    # --- ricorsioni (un solo ciclo sui float) ---
+    def _ema_step(self, name, length, v):
+        st = self._ema[name]
+        if st[1] < length:
+            st[0] += v
+            st[1] += 1
+            if st[1] == length: st[2] = st[0] / length
+        else:
+            a = 2.0 / (length + 1)
+            st[2] = a * v + (1 - a) * st[2]
+        return st[2]
+
+    def _recursive_step(self, v):
+        rsi = np.nan
+        if self._prev_close is not None:
+            d = v - self._prev_close
+            w = 1 - 1.0 / self.rsi_length
+            self._gain = (d if d > 0 else 0.0) + w * self._gain
+            self._loss = (-d if d < 0 else 0.0) + w * self._loss
+            self._den = 1.0 + w * self._den
+            self._rsi_n += 1
+            if self._rsi_n >= self.rsi_length:
+                tot = self._gain + self._loss
+                rsi = 100.0 * self._gain / tot if tot > 0 else np.nan
+        self._prev_close = v
+        fast = self._ema_step("fast", self.macd_fast, v)
+        slow = self._ema_step("slow", self.macd_slow, v)
+        macd = sig = np.nan
+        if fast is not None and slow is not None:
+            macd = fast - slow
+            s = self._ema_step("signal", self.macd_signal, macd)
+            if s is not None: sig = s
+        return rsi, macd, sig
+
+    # --- somme mobili O(1) ---
+    def _roll_step(self, v):
+        if self._ref is None: self._ref = v
+        x = v - self._ref
+        self._window.append(x)
+        w = self._window
+        for n in self._sums:
+            self._sums[n] += x
+            if len(w) > n: self._sums[n] -= w[-n - 1]
+        self._sumsq += x * x
+        if len(w) > self.bb_length: self._sumsq -= w[-self.bb_length - 1] ** 2
+
+    def _roll_values(self):
+        out = {}
+        w = self._window
+        for n in self.sma_lengths:
+            out[f"SMA{n}"] = self._sums[n] / n + self._ref if len(w) >= n else np.nan
+        n = self.bb_length
+        if len(w) >= n:
+            mean = self._sums[n] / n
+            std = max(self._sumsq / n - mean * mean, 0.0) ** 0.5
+            mid = mean + self._ref
+            out["BBL"], out["BBM"], out["BBU"] = mid - self.bb_std * std, mid, mid + self.bb_std * std
+        else:
+            out["BBL"] = out["BBM"] = out["BBU"] = np.nan
+        return out
+
+    def _snapshot(self):
+        return (self._prev_close, self._gain, self._loss, self._den, self._rsi_n,
+                {k: list(v) for k, v in self._ema.items()}, deque(self._window, maxlen=self._window.maxlen),
+                self._ref, dict(self._sums), self._sumsq, self._last)
+
+    def _restore(self, snap):
+        (self._prev_close, self._gain, self._loss, self._den, self._rsi_n,
+         self._ema, self._window, self._ref, self._sums, self._sumsq, self._last) = snap
+
+    def fit(self, close):
+        close = _ffill(np.asarray(close, dtype=float))
+        self.reset()
+        n = len(close)
+        valid = np.flatnonzero(~np.isnan(close))
+        last_i = valid[-1] if len(valid) else -1
+        # Lo stato rolling riparte dalla coda della serie
+        for v in close[valid[-self._window_len:-1]].tolist(): self._roll_step(v)
+        rsi, macd, sig = np.full(n, np.nan), np.full(n, np.nan), np.full(n, np.nan)
+        for i, v in enumerate(close.tolist()):
+            if v != v: continue
+            if i == last_i: self._undo = self._snapshot()
+            rsi[i], macd[i], sig[i] = self._recursive_step(v)
+        if last_i >= 0: self._roll_step(close[last_i])
+        out = {"RSI": rsi}
+        for length in self.sma_lengths: out[f"SMA{length}"] = sma(close, length)
+        out["BBL"], out["BBM"], out["BBU"] = bbands(close, self.bb_length, self.bb_std)
+        out["MACD"], out["MACD_sig"] = macd, sig
+        out["MACD_hist"] = macd - sig
+        if n: self._last = {k: float(a[-1]) for k, a in out.items()}
+        return out
+
+    def append(self, value):
+        self._undo = self._snapshot()
+        value = float(value)
+        rsi, macd, sig = self._recursive_step(value)
+        self._roll_step(value)
+        out = {"RSI": rsi, "MACD": macd, "MACD_sig": sig, "MACD_hist": macd - sig}
+        out.update(self._roll_values())
+        self._last = out
+        return out
+
+    def replace_last(self, value):
+        # Aggiorna la barra in formazione: si annulla l'ultimo append e si rifa'
+        if self._undo is None: raise ValueError("replace_last() requires a previous append()")
+        self._restore(self._undo)
+        return self.append(value)
+
+    @property
+    def last(self):
+        return self._last
+
+
+class IndicatorCache:
+    def __init__(self, factory=IndicatorEngine, max_entries=256):
+        self.factory = factory
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def _entry(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = {"lock": threading.Lock(), "engine": None, "index": None, "close": None, "out": None}
+                self._entries[key] = entry
+                while len(self._entries) > self.max_entries: self._entries.popitem(last=False)
+            self._entries.move_to_end(key)
+            return entry
+
+    def frame(self, key, df):
+        index, close = df.index, df["Close"].to_numpy(dtype=float)
+        entry = self._entry(key)
+        with entry["lock"]:
+            old_index, old_close, engine = entry["index"], entry["close"], entry["engine"]
+            m = 0 if old_index is None else len(old_index)
+            incremental = (
+                engine is not None and m >= 2 and len(index) >= m
+                and index[m - 1] == old_index[-1] and index[m - 2] == old_index[-2]
+                and close[m - 2] == old_close[-2] and not np.isnan(close[m - 1:]).any()
+            )
+            if not incremental:
+                engine = self.factory()
+                out = engine.fit(close)
+            else:
+                rows = []
+                if close[m - 1] != old_close[-1]: last = engine.replace_last(close[m - 1])
+                else: last = None
+                for v in close[m:].tolist(): rows.append(engine.append(v))
+                out = {}
+                for k, arr in entry["out"].items():
+                    arr = arr.copy() if last is not None else arr
+                    if last is not None: arr[-1] = last[k]
+                    out[k] = np.concatenate((arr, [r[k] for r in rows])) if rows else arr
+            entry.update(engine=engine, index=index, close=close, out=out)
+        return pd.DataFrame(out, index=index)[COLUMNS]
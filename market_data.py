@@ -0,0 +1,255 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+
+import pandas as pd
+import yfinance as yf
+
+# --- ARCHIVIO LOCALE OHLCV ---
+# Una sola serie per (simbolo, intervallo) salvata in Parquet: ogni periodo
+# del terminale (3mo...5y) e' una fetta della stessa serie.
+BARS_DIR = os.environ.get("MARKET_CORE_BARS_DIR", os.path.join(".cache", "bars"))
+BARS_REFRESH = int(os.environ.get("MARKET_CORE_BARS_REFRESH", "300"))
+
+MAX_PERIOD = "5y"
+PERIOD_OFFSETS = {
+    "1d": pd.DateOffset(days=1), "5d": pd.DateOffset(days=5),
+    "1mo": pd.DateOffset(months=1), "3mo": pd.DateOffset(months=3), "6mo": pd.DateOffset(months=6),
+    "1y": pd.DateOffset(years=1), "2y": pd.DateOffset(years=2), "5y": pd.DateOffset(years=5),
+}
+OHLCV = ["Open", "High", "Low", "Close", "Volume"]
+ADJUST_TOLERANCE = 1e-4
+
+
+def normalize_ohlcv(data):
+    df = data.copy()
+    if isinstance(df.columns, pd.MultiIndex): df.columns = df.columns.get_level_values(0)
+    df = df[[c for c in OHLCV if c in df.columns]]
+    df = df[~df.index.duplicated(keep="last")].sort_index()
+    return df.dropna(how="all")
+
+
+def slice_period(df, period):
+    if df.empty or period not in PERIOD_OFFSETS: return df
+    start = df.index[-1] - PERIOD_OFFSETS[period]
+    return df.loc[df.index > start]
+
+
+class BarStore:
+    def __init__(self, root=BARS_DIR, refresh=BARS_REFRESH, max_entries=128):
+        self.root = root
+        self.refresh = refresh
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._series = OrderedDict()
+        self._checked = {}
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, symbol, interval):
+        safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in symbol.upper())
+        return os.path.join(self.root, f"{safe}__{interval}.parquet")
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _cached(self, key):
+        with self._lock:
+            df = self._series.get(key)
+            if df is not None: self._series.move_to_end(key)
+            return df
+
+    def _remember(self, key, df, checked=None):
+        # LRU in memoria: le serie meno usate (ricerche occasionali, simboli inesistenti)
+        # escono dalla memoria e restano solo su disco
+        with self._lock:
+            self._series[key] = df
+            self._series.move_to_end(key)
+            if checked is not None: self._checked[key] = checked
+            while len(self._series) > self.max_entries:
+                old, _ = self._series.popitem(last=False)
+                self._checked.pop(old, None)
+                lock = self._key_locks.get(old)
+                if lock is not None and not lock.locked(): del self._key_locks[old]
+
+    def _read(self, symbol, interval):
+        path = self._path(symbol, interval)
+        if not os.path.exists(path): return pd.DataFrame(columns=OHLCV)
+        try: return pd.read_parquet(path)
+        except Exception: return pd.DataFrame(columns=OHLCV)
+
+    def _write(self, symbol, interval, df):
+        path = self._path(symbol, interval)
+        tmp = path + ".tmp"
+        df.to_parquet(tmp)
+        os.replace(tmp, path)
+
+    def _download_all(self, symbol, interval):
+        new = yf.download(symbol, period=MAX_PERIOD, interval=interval, auto_adjust=True, progress=False)
+        if new is None or new.empty: return None
+        return normalize_ohlcv(new)
+
+    def _top_up(self, symbol, interval, df):
+        # Scarica solo le barre mancanti a partire dalla penultima salvata:
+        # l'ultima potrebbe essere ancora in formazione, la penultima e' chiusa
+        # e fa da controllo. Se il suo prezzo rettificato non coincide piu'
+        # (split o dividendo) lo storico salvato e' da buttare e si riscarica tutto.
+        if len(df) < 2:
+            new = self._download_all(symbol, interval)
+            return (df, False) if new is None else (new, True)
+        anchor = df.index[-2]
+        new = yf.download(symbol, start=anchor.strftime("%Y-%m-%d"), interval=interval, auto_adjust=True, progress=False)
+        if new is None or new.empty: return df, False
+        new = normalize_ohlcv(new)
+        stored, fresh = df["Close"].iloc[-2], new["Close"].get(anchor)
+        if fresh is None or not abs(fresh - stored) <= ADJUST_TOLERANCE * abs(stored):
+            full = self._download_all(symbol, interval)
+            return (df, False) if full is None else (full, True)
+        merged = pd.concat([df[df.index < new.index[0]], new])
+        return merged[~merged.index.duplicated(keep="last")], True
+
+    def series(self, symbol, interval="1d"):
+        key = (symbol.upper(), interval)
+        with self._key_lock(key):
+            now = time.time()
+            cached = self._cached(key)
+            if cached is not None and now - self._checked.get(key, 0) < self.refresh:
+                return cached
+            df = cached if cached is not None else self._read(symbol, interval)
+            try:
+                df, changed = self._top_up(symbol, interval, df)
+                if changed: self._write(symbol, interval, df)
+            except Exception:
+                # Upstream non disponibile: si serve la serie salvata
+                if cached is not None:
+                    self._remember(key, cached, now)
+                    return cached
+            self._remember(key, df, now)
+            return df
+
+    def get(self, symbol, period, interval="1d"):
+        return slice_period(self.series(symbol, interval), period)
+
+    def patch(self, symbol, bar, interval="1d"):
+        # Barra in formazione dal servizio quotazioni, solo in memoria: la
+        # prossima integrazione da yfinance la sostituisce con quella definitiva.
+        # Il DataFrame non viene mai modificato sul posto (altre sessioni lo leggono).
+        key = (symbol.upper(), interval)
+        with self._key_lock(key):
+            df = self._cached(key)
+            if df is None or df.empty or not bar: return df
+            ts, last = pd.Timestamp(bar["ts"]), df.index[-1]
+            if ts < last: return df
+            row = {c: bar[c] for c in OHLCV if c in bar and c in df.columns}
+            if ts == last:
+                cur = df.iloc[-1]
+                row["Open"] = cur["Open"]
+                if "High" in row: row["High"] = max(row["High"], cur["High"])
+                if "Low" in row: row["Low"] = min(row["Low"], cur["Low"])
+                if all(cur[c] == v for c, v in row.items()): return df
+                df = df.copy()
+                df.loc[last, list(row)] = list(row.values())
+            else:
+                df = pd.concat([df, pd.DataFrame([row], index=pd.DatetimeIndex([ts], name=df.index.name))])
+            self._remember(key, df)
+            return df
+
+
+# --- SERVIZIO QUOTAZIONI CONDIVISO ---
+# Un solo thread per processo aggiorna le quotazioni e pubblica uno
+# snapshot immutabile: le sessioni lo leggono senza mai bloccarsi sulla rete.
+# Oltre ai simboli fissi della striscia, le sessioni registrano con watch()
+# i ticker dei loro portafogli: tutti vengono prezzati con un'unica
+# richiesta per ciclo, indipendentemente dal numero di utenti. Lo snapshot
+# contiene anche l'ultima barra giornaliera di ogni simbolo (modalita' live).
+QUOTES_REFRESH = int(os.environ.get("MARKET_CORE_QUOTES_REFRESH", "60"))
+WATCH_TTL = 900
+
+
+class QuoteSnapshot:
+    __slots__ = ("prices", "bars", "updated_at")
+
+    def __init__(self, prices, updated_at, bars=None):
+        object.__setattr__(self, "prices", MappingProxyType(dict(prices)))
+        object.__setattr__(self, "bars", MappingProxyType(dict(bars or {})))
+        object.__setattr__(self, "updated_at", updated_at)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("QuoteSnapshot is immutable")
+
+    def age(self):
+        return None if self.updated_at is None else time.time() - self.updated_at
+
+
+class QuoteService:
+    def __init__(self, symbols, refresh=QUOTES_REFRESH, watch_ttl=WATCH_TTL, min_gap=5):
+        self.symbols = list(symbols)
+        self.refresh = refresh
+        self.watch_ttl = watch_ttl
+        self.min_gap = min_gap
+        self._snapshot = QuoteSnapshot({}, None)
+        self._watched = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="quote-service", daemon=True)
+        self._thread.start()
+
+    def watch(self, symbols):
+        now = time.time()
+        new = False
+        with self._lock:
+            for s in symbols:
+                s = s.upper()
+                new = new or (s not in self._watched and s not in self.symbols)
+                self._watched[s] = now
+        # Un simbolo mai prezzato anticipa il prossimo ciclo
+        if new: self._wake.set()
+
+    def _active_symbols(self):
+        cutoff = time.time() - self.watch_ttl
+        with self._lock:
+            for s in [s for s, seen in self._watched.items() if seen < cutoff]: del self._watched[s]
+            return list(dict.fromkeys(self.symbols + list(self._watched)))
+
+    def _fetch(self):
+        symbols = self._active_symbols()
+        data = yf.download(symbols, period="5d", group_by="ticker", auto_adjust=True, progress=False)
+        prices, bars = {}, {}
+        for s in symbols:
+            try:
+                frame = data[s].dropna(subset=["Close"])
+                row = frame.iloc[-1]
+                prices[s] = float(row["Close"])
+                bars[s] = dict({c: float(row[c]) for c in OHLCV if c in row.index and row[c] == row[c]}, ts=frame.index[-1])
+            except Exception: pass
+        return prices, bars
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                prices, bars = self._fetch()
+                if prices:
+                    # Se un simbolo fallisce si tiene l'ultimo prezzo noto
+                    merged, merged_bars = dict(self._snapshot.prices), dict(self._snapshot.bars)
+                    merged.update(prices)
+                    merged_bars.update(bars)
+                    self._snapshot = QuoteSnapshot(merged, time.time(), merged_bars)
+            except Exception: pass
+            self._ready.set()
+            last = time.time()
+            self._wake.wait(self.refresh)
+            self._wake.clear()
+            self._stop.wait(max(self.min_gap - (time.time() - last), 0))
+
+    def snapshot(self, wait=0):
+        if wait: self._ready.wait(wait)
+        return self._snapshot
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
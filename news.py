@@ -0,0 +1,107 @@
+import io
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# --- MOTORE NOTIZIE ---
+# Feed Google News scaricati in parallelo su una sessione HTTP condivisa
+# (connessioni riusate), rivalidati con ETag/If-Modified-Since. Il corpo (poche
+# decine di KB) si legge per intero, cosi' la connessione torna al pool, e
+# iterparse si ferma dopo max_items. Cache LRU di al massimo max_entries query.
+NEWS_URL = "https://news.google.com/rss/search"
+
+
+class NewsEngine:
+    def __init__(self, ttl=600, max_items=5, workers=8, timeout=5, max_entries=512):
+        self.ttl = ttl
+        self.max_items = max_items
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=workers)
+        self.session.mount("https://", adapter)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="news")
+        self._lock = threading.Lock()
+        self._feeds = OrderedDict()
+        self._feed_locks = {}
+
+    def _params(self, query):
+        return {"q": f"{query} stock market", "hl": "it", "gl": "IT"}
+
+    def _parse(self, raw):
+        items = []
+        for _, el in ET.iterparse(raw, events=("end",)):
+            if el.tag != "item": continue
+            title, link = el.findtext("title"), el.findtext("link")
+            if title and link: items.append({"t": title, "l": link})
+            el.clear()
+            if len(items) >= self.max_items: break
+        return items
+
+    def _feed_lock(self, query):
+        with self._lock:
+            # Ogni testo digitato crea un lock: si tengono solo quelli di query in cache o in corso
+            if len(self._feed_locks) > 2 * self.max_entries:
+                self._feed_locks = {q: lk for q, lk in self._feed_locks.items() if q in self._feeds or lk.locked()}
+            return self._feed_locks.setdefault(query, threading.Lock())
+
+    def _cached(self, query):
+        with self._lock:
+            cached = self._feeds.get(query)
+            if cached is not None: self._feeds.move_to_end(query)
+            return cached
+
+    def _store(self, query, entry):
+        with self._lock:
+            self._feeds[query] = entry
+            self._feeds.move_to_end(query)
+            while len(self._feeds) > self.max_entries: self._feeds.popitem(last=False)
+
+    def feed(self, query):
+        # Una sola richiesta per query anche con molte sessioni in attesa
+        with self._feed_lock(query):
+            cached = self._cached(query)
+            now = time.time()
+            if cached and now - cached["fetched_at"] < self.ttl: return cached["items"]
+            headers = {}
+            if cached and cached.get("etag"): headers["If-None-Match"] = cached["etag"]
+            if cached and cached.get("last_modified"): headers["If-Modified-Since"] = cached["last_modified"]
+            try:
+                r = self.session.get(NEWS_URL, params=self._params(query), headers=headers, timeout=self.timeout)
+                if r.status_code == 304 and cached:
+                    cached["fetched_at"] = now
+                    return cached["items"]
+                r.raise_for_status()
+                items = self._parse(io.BytesIO(r.content))
+                self._store(query, {
+                    "items": items, "fetched_at": now,
+                    "etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified"),
+                })
+                return items
+            except Exception:
+                # In caso di errore si serve l'ultima versione nota, se esiste
+                if cached:
+                    cached["fetched_at"] = now
+                    return cached["items"]
+                return []
+
+    def fetch_many(self, queries):
+        queries = list(dict.fromkeys(q for q in queries if q))
+        futures = {q: self._pool.submit(self.feed, q) for q in queries}
+        return {q: f.result() for q, f in futures.items()}
+
+    def merged(self, queries):
+        # Stessa notizia da piu' feed: si tiene la prima (prima query = asset cercato)
+        seen, out = set(), []
+        for q, items in self.fetch_many(queries).items():
+            for item in items:
+                key = (item["l"], item["t"].strip().lower())
+                if key[0] in seen or key[1] in seen: continue
+                seen.update(key)
+                out.append(dict(item, q=q))
+        return out
@@ -0,0 +1,91 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from indicators import rsi, sma
+
+# --- SCREENER WATCHLIST ---
+# Stessi segnali del terminale (RSI 30/70, incrocio SMA20/SMA50) calcolati in
+# blocco su una matrice date x simboli. Con universi grandi le colonne vengono
+# divise tra piu' processi.
+DOWNLOAD_CHUNK = 200
+PARALLEL_THRESHOLD = 2000
+CROSS_LOOKBACK = 5
+SCREEN_COLUMNS = ["symbol", "close", "chg_1d", "RSI", "SMA20", "SMA50", "trend", "cross_days", "signal", "score"]
+
+
+def parse_watchlist(text):
+    return list(dict.fromkeys(s.strip().upper() for s in text.replace(";", ",").replace("\n", ",").split(",") if s.strip()))
+
+
+def load_closes(symbols, period="1y"):
+    # Una richiesta per blocco di simboli invece di una per simbolo
+    frames = []
+    for i in range(0, len(symbols), DOWNLOAD_CHUNK):
+        chunk = symbols[i:i + DOWNLOAD_CHUNK]
+        data = yf.download(chunk, period=period, interval="1d", auto_adjust=True, progress=False, group_by="column")
+        if data is None or data.empty: continue
+        close = data["Close"]
+        if isinstance(close, pd.Series): close = close.to_frame(chunk[0])
+        frames.append(close)
+    if not frames: return pd.DataFrame()
+    closes = pd.concat(frames, axis=1).sort_index()
+    return closes.loc[:, ~closes.columns.duplicated()].dropna(axis=1, how="all")
+
+
+def align_right(m):
+    # Ogni colonna tiene solo le sue barre valide, allineate in fondo: simboli
+    # con calendari diversi (crypto nel weekend, festivita' di borsa) vengono
+    # confrontati sulle proprie sedute e l'ultima riga e' l'ultima seduta di ciascuno.
+    order = np.argsort(~np.isnan(m), axis=0, kind="stable")
+    return np.take_along_axis(m, order, axis=0)
+
+
+def compute_signals(symbols, close):
+    close = align_right(np.asarray(close, dtype=float))
+    r = rsi(close, 14)
+    s20, s50 = sma(close, 20), sma(close, 50)
+    last_close = close[-1]
+    prev_close = close[-2] if len(close) > 1 else close[-1]
+
+    spread = np.sign(s20 - s50)
+    # Sedute dall'ultimo incrocio SMA20/SMA50 (positive = golden cross, negative = death cross)
+    changed = (spread[1:] != spread[:-1]) & (spread[1:] != 0) & ~np.isnan(spread[:-1])
+    cross_days = np.full(close.shape[1], np.nan)
+    if len(changed):
+        since = np.argmax(changed[::-1], axis=0)
+        cross_days = np.where(changed.any(axis=0), since, np.nan)
+    trend = spread[-1]
+
+    last_rsi = r[-1]
+    recent = np.nan_to_num(cross_days, nan=np.inf) <= CROSS_LOOKBACK
+    buy = (last_rsi < 30) | (recent & (trend > 0))
+    sell = (last_rsi > 70) | (recent & (trend < 0))
+    signal = np.where(buy & ~sell, "BUY", np.where(sell & ~buy, "SELL", "HOLD"))
+    # Punteggio: distanza dall'RSI neutro + bonus per incrocio recente nel verso del trend
+    score = (50 - last_rsi) + np.where(recent, 20 * trend, 5 * np.nan_to_num(trend))
+
+    return pd.DataFrame({
+        "symbol": list(symbols), "close": last_close, "chg_1d": (last_close / prev_close - 1) * 100,
+        "RSI": last_rsi, "SMA20": s20[-1], "SMA50": s50[-1],
+        "trend": np.where(trend > 0, "↑", np.where(trend < 0, "↓", "–")),
+        "cross_days": cross_days * np.where(trend < 0, -1, 1), "signal": signal, "score": score,
+    })
+
+
+def screen(closes, workers=None):
+    if closes.empty: return pd.DataFrame(columns=SCREEN_COLUMNS)
+    symbols = list(closes.columns)
+    matrix = closes.to_numpy(dtype=float)
+    if len(symbols) < PARALLEL_THRESHOLD:
+        result = compute_signals(symbols, matrix)
+    else:
+        workers = workers or min(os.cpu_count() or 1, 8)
+        parts = np.array_split(np.arange(len(symbols)), workers)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(compute_signals, [symbols[i] for i in p], matrix[:, p]) for p in parts if len(p)]
+            result = pd.concat([f.result() for f in futures], ignore_index=True)
+    return result[SCREEN_COLUMNS].sort_values("score", ascending=False, na_position="last").reset_index(drop=True)
@@ -0,0 +1,166 @@
+import csv
+import os
+import re
+import unicodedata
+from collections import namedtuple
+
+# --- INDICE SIMBOLI ---
+# Universo locale (symbols.csv: ticker, nome, alias IT/EN/ES/FR) caricato una
+# volta per processo. Un trie sui prefissi risponde mentre l'utente digita; per
+# gli errori di battitura un indice a cancellazioni (stile SymSpell) trova i
+# termini entro 1-2 modifiche senza scorrere l'intero universo.
+SYMBOLS_PATH = os.environ.get("MARKET_CORE_SYMBOLS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "symbols.csv"))
+MAX_SUGGESTIONS = 8
+FUZZY_MIN_LEN = 4
+STOPWORDS = {"inc", "co", "corp", "corporation", "company", "group", "holding", "holdings", "ltd", "plc", "ag", "se",
+             "sa", "s", "a", "p", "n", "v", "nv", "spa", "the", "and", "of", "class", "de", "di", "futures", "index"}
+TICKER_RE = re.compile(r"^[A-Z0-9^][A-Z0-9.\-=^]{0,14}$")
+TICKER_ROOT_MAX = 5
+
+# Ordine di priorita' dei termini: ticker completo, alias, nome, radice del ticker, parola del nome
+KIND_SYMBOL, KIND_ALIAS, KIND_NAME, KIND_BASE, KIND_WORD = range(5)
+
+Suggestion = namedtuple("Suggestion", ["symbol", "name", "match", "distance"])
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode().lower()
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text).split())
+
+
+def _ticker_like(raw):
+    # Radice corta in stile ticker, anche in minuscolo: mara, bb, eni.mi, sol-usd
+    return bool(TICKER_RE.match(raw.upper())) and len(re.split(r"[-.=]", raw.lstrip("^"))[0]) <= TICKER_ROOT_MAX
+
+
+def _deletes(term, depth):
+    out, frontier = {term}, {term}
+    for _ in range(depth):
+        frontier = {t[:i] + t[i + 1:] for t in frontier for i in range(len(t))}
+        out |= frontier
+    return out
+
+
+def _distance(a, b, limit):
+    # Damerau-Levenshtein (optimal string alignment), interrotta oltre limit
+    if abs(len(a) - len(b)) > limit: return limit + 1
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit: return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class SymbolIndex:
+    def __init__(self, rows, max_distance=2):
+        self.max_distance = max_distance
+        self.entries = []
+        self._terms = {}
+        self._trie = [{}, []]
+        self._deleted = {}
+        for symbol, name, aliases in rows:
+            self._add(symbol.strip(), name.strip(), [a for a in aliases if a.strip()])
+        self._finish(self._trie)
+
+    @classmethod
+    def load(cls, path=SYMBOLS_PATH, **kwargs):
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = [(r["symbol"], r["name"], (r.get("aliases") or "").split("|")) for r in csv.DictReader(f) if r.get("symbol")]
+        return cls(rows, **kwargs)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _add(self, symbol, name, aliases):
+        idx = len(self.entries)
+        self.entries.append((symbol, name))
+        terms = {normalize(symbol): KIND_SYMBOL, normalize(name): KIND_NAME}
+        base = normalize(re.split(r"[-.=]", symbol.lstrip("^"))[0])
+        for alias in aliases: terms.setdefault(normalize(alias), KIND_ALIAS)
+        terms.setdefault(base, KIND_BASE)
+        for text in [name] + aliases:
+            for word in normalize(text).split():
+                if len(word) > 1 and word not in STOPWORDS: terms.setdefault(word, KIND_WORD)
+        for term, kind in terms.items():
+            if not term: continue
+            rank = (kind, idx)
+            self._terms.setdefault(term, []).append(rank)
+            node = self._trie
+            for ch in term:
+                node = node[0].setdefault(ch, [{}, []])
+                node[1].append(rank)
+            if len(term) >= FUZZY_MIN_LEN:
+                for d in _deletes(term, self._depth(len(term))): self._deleted.setdefault(d, set()).add(term)
+
+    def _depth(self, n):
+        return min(self.max_distance, 1 if n <= 6 else 2)
+
+    def _finish(self, root):
+        # Ogni nodo tiene solo i migliori MAX_SUGGESTIONS: la ricerca per prefisso non ordina nulla
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            best = {}
+            for kind, idx in sorted(node[1]): best.setdefault(idx, (kind, idx))
+            node[1] = sorted(best.values())[:MAX_SUGGESTIONS]
+            stack.extend(node[0].values())
+
+    def _prefix(self, term):
+        node = self._trie
+        for ch in term:
+            node = node[0].get(ch)
+            if node is None: return []
+        return node[1]
+
+    def _fuzzy(self, term):
+        limit = self._depth(len(term))
+        found = {}
+        for d in _deletes(term, limit):
+            for cand in self._deleted.get(d, ()):
+                if cand in found: continue
+                found[cand] = _distance(term, cand, limit)
+        return [(dist, cand) for cand, dist in found.items() if dist <= limit]
+
+    def search(self, query, limit=MAX_SUGGESTIONS):
+        term = normalize(query)
+        if not term: return []
+        scored = {}
+
+        def offer(idx, score, match):
+            if idx not in scored or score < scored[idx][0]: scored[idx] = (score, match)
+
+        # Una singola parola del nome vale come un prefisso: "micro" non e' una corrispondenza esatta
+        for kind, idx in self._terms.get(term, ()):
+            if kind < KIND_WORD: offer(idx, (0, 0, kind, idx), "exact")
+            else: offer(idx, (1, 0, kind, idx), "prefix")
+        for kind, idx in self._prefix(term): offer(idx, (1, 0, kind, idx), "prefix")
+        # Il fuzzy interviene solo se nessun termine coincide o inizia con la query
+        if not scored and len(term) >= FUZZY_MIN_LEN:
+            for dist, cand in self._fuzzy(term):
+                for kind, idx in self._terms[cand]: offer(idx, (2, dist, kind, idx), "fuzzy")
+        ranked = sorted(scored.items(), key=lambda kv: kv[1][0])[:limit]
+        return [Suggestion(self.entries[idx][0], self.entries[idx][1], match, score[1]) for idx, (score, match) in ranked]
+
+    def resolve(self, query, substitute=True):
+        # Solo risoluzioni certe: ticker, nome o alias esatti, un ticker scritto in maiuscolo o un
+        # errore di battitura su una parola troppo lunga per essere un ticker ("bitcon"). Il resto
+        # (prefissi, minuscole brevi come "telsa" o "mara") e' ambiguo: None, e l'interfaccia mostra
+        # i suggerimenti invece di interrogare upstream un simbolo probabilmente inesistente
+        raw = query.strip()
+        hits = self.search(raw, limit=1)
+        if hits and hits[0].match == "exact": return hits[0].symbol
+        if TICKER_RE.match(raw): return raw
+        if not substitute: return raw.upper()
+        if hits and hits[0].match == "fuzzy" and not _ticker_like(raw): return hits[0].symbol
+        return None
+
+    def ticker_candidate(self, query):
+        # Input che potrebbe essere un ticker fuori dall'universo: lo si offre come scelta esplicita
+        raw = query.strip().upper()
+        return raw if TICKER_RE.match(raw) else None
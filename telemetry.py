@@ -0,0 +1,58 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# --- TELEMETRIA ---
+# Span con nome attorno a ogni fase del terminale: finestra mobile per fase
+# (p50/p95 nel pannello admin) ed export JSON-lines opzionale per lo scraping.
+TIMINGS_PATH = os.environ.get("MARKET_CORE_TIMINGS_PATH")
+# 0 = niente ritardi scenografici (boot, log finti, effetto macchina da scrivere)
+COSMETIC_DELAYS = os.environ.get("MARKET_CORE_COSMETIC_DELAYS", "1") != "0"
+
+
+def pause(seconds):
+    if COSMETIC_DELAYS: time.sleep(seconds)
+
+
+def percentile(sorted_values, q):
+    # Nearest rank: il piu' piccolo valore con almeno il q% delle osservazioni minori o uguali
+    if not sorted_values: return None
+    k = min(len(sorted_values) - 1, max(0, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+class Telemetry:
+    def __init__(self, window=500, export_path=TIMINGS_PATH):
+        self.window = window
+        self.export_path = export_path
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    @contextmanager
+    def span(self, name, **tags):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - t0, **tags)
+
+    def record(self, name, seconds, **tags):
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self.window)).append(seconds)
+            if self.export_path:
+                line = {"ts": round(time.time(), 3), "stage": name, "ms": round(seconds * 1000, 3), **tags}
+                try:
+                    with open(self.export_path, "a", encoding="utf-8") as f: f.write(json.dumps(line) + "\n")
+                except OSError: pass
+
+    def summary(self):
+        with self._lock:
+            samples = {k: sorted(v) for k, v in self._samples.items()}
+        return [
+            {"stage": k, "count": len(v), "p50_ms": percentile(v, 50) * 1000, "p95_ms": percentile(v, 95) * 1000, "max_ms": v[-1] * 1000}
+            for k, v in sorted(samples.items())
+        ]
@@ -0,0 +1,54 @@
+# Parita' del motore indicatori con pandas_ta e con il riferimento pandas (ewm/rolling).
+#   pip install -r requirements-bench.txt && python -m pytest -q tests
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "bench")]
+
+from bench_indicators import TOLERANCE, pandas_reference, pandas_ta_frame, parity, synthetic_close  # noqa: E402
+from indicators import IndicatorEngine  # noqa: E402
+
+SIZES = [60, 1260, 20000]
+
+
+@pytest.mark.parametrize("n", SIZES)
+def test_parity_pandas_reference(n):
+    worst = parity(synthetic_close(n, seed=n), pandas_reference)
+    assert max(worst.values()) <= TOLERANCE, worst
+
+
+@pytest.mark.parametrize("n", SIZES)
+def test_parity_pandas_ta(n):
+    # Nessuno skip: senza pandas_ta (requirements-bench.txt) il confronto reale deve fallire in modo visibile
+    try:
+        import bench_indicators
+        import pandas_ta
+    except ImportError:
+        pytest.fail("pandas_ta non installato: pip install -r requirements-bench.txt")
+    bench_indicators.ta = pandas_ta
+    worst = parity(synthetic_close(n, seed=n), pandas_ta_frame)
+    assert max(worst.values()) <= TOLERANCE, worst
+
+
+def test_append_matches_fit():
+    close = synthetic_close(1500)
+    engine = IndicatorEngine()
+    engine.fit(close[:1000])
+    for v in close[1000:].tolist(): engine.append(v)
+    full = IndicatorEngine().fit(close)
+    for k, v in engine.last.items():
+        assert abs(v - full[k][-1]) <= TOLERANCE * max(abs(full[k][-1]), 1.0), k
+
+
+def test_replace_last_matches_fit():
+    close = synthetic_close(500)
+    engine = IndicatorEngine()
+    engine.fit(close[:-1])
+    engine.append(close[-1] * 1.05)
+    engine.replace_last(close[-1])
+    full = IndicatorEngine().fit(close)
+    assert all(np.isclose(v, full[k][-1], rtol=TOLERANCE, atol=0) for k, v in engine.last.items())
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+# --- VALUTAZIONE PORTAFOGLIO ---
+# Righe del foglio Portafoglio [email, ticker, prezzo, quantita', ...]
+# aggregate per ticker in un'unica groupby, poi valutate ai prezzi correnti.
+POSITION_COLUMNS = ["ticker", "lots", "qty", "cost", "avg_cost", "price", "value", "pnl", "pnl_pct", "weight"]
+
+
+def lots_frame(rows):
+    rows = [r for r in rows if len(r) >= 4]
+    if not rows: return pd.DataFrame({"ticker": [], "price": [], "qty": []})
+    df = pd.DataFrame([r[1:4] for r in rows], columns=["ticker", "price", "qty"])
+    df["ticker"] = df["ticker"].str.upper().str.strip()
+    df[["price", "qty"]] = df[["price", "qty"]].apply(pd.to_numeric, errors="coerce")
+    return df.dropna(subset=["price", "qty"])
+
+
+def positions(rows, quotes):
+    lots = lots_frame(rows)
+    if lots.empty: return pd.DataFrame(columns=POSITION_COLUMNS)
+    lots["cost"] = lots["price"] * lots["qty"]
+    pos = lots.groupby("ticker", sort=False).agg(lots=("qty", "size"), qty=("qty", "sum"), cost=("cost", "sum")).reset_index()
+    pos["avg_cost"] = pos["cost"] / pos["qty"].replace(0, np.nan)
+    pos["price"] = pos["ticker"].map(quotes).astype(float)
+    pos["value"] = pos["qty"] * pos["price"]
+    pos["pnl"] = pos["value"] - pos["cost"]
+    pos["pnl_pct"] = pos["pnl"] / pos["cost"].replace(0, np.nan) * 100
+    total = pos["value"].sum(min_count=1)
+    pos["weight"] = pos["value"] / total * 100 if total and total == total else np.nan
+    return pos[POSITION_COLUMNS].sort_values("value", ascending=False, na_position="last").reset_index(drop=True)
+
+
+def totals(pos):
+    priced = pos.dropna(subset=["value"])
+    value, cost = priced["value"].sum(), priced["cost"].sum()
+    return {"value": value, "cost": cost, "pnl": value - cost, "pnl_pct": (value - cost) / cost * 100 if cost else np.nan,
+            "unpriced": int(pos["value"].isna().sum())}